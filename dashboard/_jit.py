@@ -0,0 +1,14 @@
+"""
+Optional numba support for Project Victoria Dashboard
+"""
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(*args, **kwargs):
+        """Fallback decorator: run the plain Python function without numba"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
@@ -4,20 +4,20 @@ Real-time visualization of OBU localization using RSSI trilateration
 """
 import streamlit as st
 import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import time
-import json
+from datetime import datetime
+import copy
+from collections import deque
 
 # Import project modules
 from config import config
 from mqtt_handler import MQTTHandler
-from trilateration import RSSITrilaterationSolver
-from field_config import validate_rsu_positions
-from data_processing import format_rssi_for_display, calculate_data_rate
+from field_config import validate_rsu_coords
+from data_processing import (
+    PositionBuffer, downsample_trail, format_rssi_for_display,
+    calculate_data_rate_from_timestamps, timestamp_to_epoch,
+    validate_position_batch, describe_position_flags
+)
 
 # Page configuration
 st.set_page_config(
@@ -28,7 +28,7 @@ st.set_page_config(
 )
 
 # Custom CSS
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -55,120 +55,228 @@ st.markdown("""
         font-family: monospace;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Session state defaults (mutable values are copied on first use per session)
+SESSION_DEFAULTS = {
+    'mqtt_handler': None,
+    'rssi_ids': np.empty(0, dtype=str),
+    'rssi_values': np.empty(0, dtype=np.float32),
+    'field_width': config.field.width,
+    'field_height': config.field.height,
+    'position_flags': 0,  # validate_position_batch flags of the latest position
+    'rsu_coords': np.array(
+        [config.field.rsu_positions[rsu_id] for rsu_id in config.field.RSU_IDS], dtype=np.float64
+    ),  # (N, 2) x, y per RSU in RSU_IDS order
+    'auto_refresh': True,
+    'show_trail': True,
+    'last_update': None,
+    'connection_mode': None,  # None, 'aws_iot', 'demo'
+    'snapshot': None,  # Latest MQTTHandler.snapshot()
+    'data_key': None,  # (handler id, version) of the data in session state
+    'field_fig': None,
+    'field_fig_key': None,
+    'trail_cache': None,
+    'trail_cache_version': None,
+    'field_render_sig': None,
+    'rssi_fig': None,
+    'rssi_fig_source': None
+}
+
+def inject_custom_css():
+    """Inject custom CSS (full script runs only, fragments keep it in place)"""
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 def init_session_state():
     """Initialize Streamlit session state"""
-    if 'mqtt_handler' not in st.session_state:
-        st.session_state.mqtt_handler = None
-    
-    if 'position_data' not in st.session_state:
-        st.session_state.position_data = []
-    
-    if 'rssi_data' not in st.session_state:
-        st.session_state.rssi_data = {}
-    
-    if 'field_width' not in st.session_state:
-        st.session_state.field_width = config.field.width
-    
-    if 'field_height' not in st.session_state:
-        st.session_state.field_height = config.field.height
-    
-    if 'rsu_positions' not in st.session_state:
-        st.session_state.rsu_positions = dict(config.field.rsu_positions)
-    
-    if 'auto_refresh' not in st.session_state:
-        st.session_state.auto_refresh = True
-    
-    if 'show_trail' not in st.session_state:
-        st.session_state.show_trail = True
+    session = st.session_state
+    for key, default in SESSION_DEFAULTS.items():
+        if key not in session:
+            session[key] = copy.copy(default)
     
-    if 'last_update' not in st.session_state:
-        st.session_state.last_update = None
+    # Per-session buffers, sized from config
+    if 'position_buffer' not in session:
+        session.position_buffer = PositionBuffer(config.dashboard.max_trail_points)
     
-    if 'connection_mode' not in st.session_state:
-        st.session_state.connection_mode = None  # None, 'aws_iot', 'demo'
+    if 'pending_positions' not in session:
+        session.pending_positions = deque(maxlen=config.dashboard.max_trail_points)
 
-def data_callback(position_data):
-    """Callback function for new position data"""
-    # Don't access st.session_state from background thread
-    # Just pass the data through - it will be picked up by get_latest_data()
-    pass
+def make_data_callback(pending_positions):
+    """Create the callback function for new position data"""
+    def data_callback(position_data):
+        # Runs on the MQTT thread - don't access st.session_state here,
+        # only enqueue the sample; deque.append is thread-safe
+        ts = timestamp_to_epoch(position_data['timestamp'])
+        pending_positions.append((position_data['x'], position_data['y'], position_data['accuracy'], ts))
+    
+    return data_callback
 
-def create_field_plot():
-    """Create the main field visualization plot"""
-    fig = go.Figure()
-    
-    # Field boundary
-    fig.add_shape(
-        type="rect",
-        x0=0, y0=0,
-        x1=st.session_state.field_width,
-        y1=st.session_state.field_height,
-        line=dict(color="black", width=2),
-        fillcolor="rgba(240, 248, 255, 0.1)"
-    )
+def drain_pending_positions():
+    """Move queued position samples into the position buffer in one batch"""
+    pending = st.session_state.pending_positions
+    batch = []
+    while pending:
+        batch.append(pending.popleft())
+    
+    if batch:
+        samples = np.asarray(batch, dtype=np.float64)
+        flags = validate_position_batch(samples[:, 0], samples[:, 1], samples[:, 2])
+        st.session_state.position_flags = int(flags[-1])
+        st.session_state.position_buffer.extend(samples)
+
+# Trace order in the field figure
+RSU_TRACE_IDX = 0
+TRAIL_TRACE_IDX = 1
+CURRENT_TRACE_IDX = 2
+
+# Static field figure styling
+_FIELD_BOUNDARY_STYLE = dict(
+    type="rect",
+    x0=0, y0=0,
+    line=dict(color="black", width=2),
+    fillcolor="rgba(240, 248, 255, 0.1)"
+)
+
+_TRAIL_TRACE_STYLE = dict(
+    x=[], y=[],
+    mode='lines',
+    line=dict(color='blue', width=2, dash='dot'),
+    name='Trail',
+    uid='trail',
+    opacity=0.6,
+    hoverinfo='skip',
+    visible=False
+)
+
+_CURRENT_TRACE_STYLE = dict(
+    x=[], y=[],
+    mode='markers',
+    marker=dict(size=20, color='blue', symbol='circle'),
+    name='Current Position',
+    uid='current',
+    hovertemplate='<b>Current Position</b><br>X: %{x:.2f}m<br>Y: %{y:.2f}m<extra></extra>',
+    visible=False
+)
+
+_FIELD_LAYOUT_TEMPLATE = dict(
+    title=dict(text="Construction Site Field View"),
+    xaxis=dict(title=dict(text="X Position (meters)")),
+    # Equal aspect ratio
+    yaxis=dict(title=dict(text="Y Position (meters)"), scaleanchor="x", scaleratio=1),
+    showlegend=True,
+    height=500,
+    template="plotly_white",
+    uirevision='constant'  # Keep user zoom/pan across live updates
+)
+
+@st.cache_resource(max_entries=16)
+def create_rsu_trace(rsu_coords):
+    """
+    Create the RSU marker trace
+    
+    Cached per RSU layout and shared across sessions; add_trace() copies
+    the trace, so the cached object itself is never mutated.
     
-    # RSU positions
-    rsu_x = [pos[0] for pos in st.session_state.rsu_positions.values()]
-    rsu_y = [pos[1] for pos in st.session_state.rsu_positions.values()]
-    rsu_names = list(st.session_state.rsu_positions.keys())
+    Args:
+        rsu_coords: Array of shape (N, 2) with x, y per RSU in RSU_IDS order
+    """
+    rsu_coords = rsu_coords.astype(np.float32)
     
-    fig.add_trace(go.Scatter(
-        x=rsu_x, y=rsu_y,
+    return go.Scattergl(
+        x=rsu_coords[:, 0], y=rsu_coords[:, 1],
         mode='markers+text',
         marker=dict(size=15, color='red', symbol='diamond'),
-        text=rsu_names,
+        text=list(config.field.RSU_IDS),
         textposition="top center",
         name='RSUs',
+        uid='rsus',
         hovertemplate='<b>%{text}</b><br>X: %{x:.1f}m<br>Y: %{y:.1f}m<extra></extra>'
-    ))
-    
-    # Position trail
-    if st.session_state.show_trail and st.session_state.position_data:
-        trail_x = [pos['x'] for pos in st.session_state.position_data]
-        trail_y = [pos['y'] for pos in st.session_state.position_data]
-        
-        # Trail line
-        fig.add_trace(go.Scatter(
-            x=trail_x, y=trail_y,
-            mode='lines',
-            line=dict(color='blue', width=2, dash='dot'),
-            name='Trail',
-            opacity=0.6,
-            hoverinfo='skip'
-        ))
+    )
+
+def create_base_field_figure(field_width, field_height, rsu_coords):
+    """
+    Create the static part of the field plot
+    
+    Args:
+        field_width: Field width in meters
+        field_height: Field height in meters
+        rsu_coords: Array of shape (N, 2) with x, y per RSU in RSU_IDS order
         
-        # Current position
-        if trail_x and trail_y:
-            fig.add_trace(go.Scatter(
-                x=[trail_x[-1]], y=[trail_y[-1]],
-                mode='markers',
-                marker=dict(size=20, color='blue', symbol='circle'),
-                name='Current Position',
-                hovertemplate='<b>Current Position</b><br>X: %{x:.2f}m<br>Y: %{y:.2f}m<extra></extra>'
-            ))
+    Returns:
+        Figure with field boundary, RSU markers and empty trail traces
+    """
+    # WebGL traces keep long trails cheap to draw in the browser
+    # Trace order must match RSU_TRACE_IDX, TRAIL_TRACE_IDX and CURRENT_TRACE_IDX
+    traces = [
+        create_rsu_trace(rsu_coords),
+        go.Scattergl(_TRAIL_TRACE_STYLE),
+        go.Scattergl(_CURRENT_TRACE_STYLE)
+    ]
+    
+    layout = dict(
+        _FIELD_LAYOUT_TEMPLATE,
+        xaxis=dict(_FIELD_LAYOUT_TEMPLATE['xaxis'], range=[-5, field_width + 5]),
+        yaxis=dict(_FIELD_LAYOUT_TEMPLATE['yaxis'], range=[-5, field_height + 5]),
+        shapes=[dict(_FIELD_BOUNDARY_STYLE, x1=field_width, y1=field_height)]
+    )
     
-    # Layout
-    fig.update_layout(
-        title="Construction Site Field View",
-        xaxis_title="X Position (meters)",
-        yaxis_title="Y Position (meters)",
-        xaxis=dict(range=[-5, st.session_state.field_width + 5]),
-        yaxis=dict(range=[-5, st.session_state.field_height + 5]),
-        showlegend=True,
-        height=500,
-        template="plotly_white"
+    return go.Figure(data=traces, layout=layout)
+
+def create_field_plot():
+    """Create the main field visualization plot"""
+    session = st.session_state
+    
+    # Static parts are only rebuilt when the field configuration changes
+    fig_key = (
+        session.field_width,
+        session.field_height,
+        session.rsu_coords.tobytes()
     )
+    if session.field_fig_key != fig_key:
+        session.field_fig = create_base_field_figure(
+            session.field_width, session.field_height, session.rsu_coords
+        )
+        session.field_fig_key = fig_key
     
-    # Equal aspect ratio
-    fig.update_yaxes(scaleanchor="x", scaleratio=1)
+    fig = session.field_fig
+    position_buffer = session.position_buffer
+    
+    # Nothing new since the last render - the figure is already up to date
+    render_sig = (fig_key, position_buffer.version, session.show_trail)
+    if session.field_render_sig == render_sig:
+        return fig
+    session.field_render_sig = render_sig
+    
+    # Position trail
+    show_trail = bool(session.show_trail and position_buffer.count)
+    if show_trail:
+        # Downsampled trails are reused until the buffer changes
+        if session.trail_cache_version != position_buffer.version:
+            trail_x, trail_y = position_buffer.trail()
+            session.trail_cache = downsample_trail(
+                trail_x, trail_y, config.dashboard.trail_render_points
+            )
+            session.trail_cache_version = position_buffer.version
+        trail_x, trail_y = session.trail_cache
+    else:
+        trail_x, trail_y = [], []
+    
+    with fig.batch_update():
+        fig.data[TRAIL_TRACE_IDX].update(x=trail_x, y=trail_y, visible=show_trail)
+        fig.data[CURRENT_TRACE_IDX].update(x=trail_x[-1:], y=trail_y[-1:], visible=show_trail)
     
     return fig
 
+# RSSI color buckets: < -80 dBm red, < -60 dBm orange, otherwise green
+_RSSI_COLOR_BINS = np.array([-80.0, -60.0], dtype=np.float32)
+_RSSI_COLORS = np.array(['red', 'orange', 'green'])
+
 def create_rssi_chart():
     """Create RSSI strength visualization"""
-    if not st.session_state.rssi_data:
+    rsu_ids = st.session_state.rssi_ids
+    rssi_values = st.session_state.rssi_values
+    
+    if not rssi_values.size:
         return go.Figure().add_annotation(
             text="No RSSI data available",
             xref="paper", yref="paper",
@@ -176,25 +284,15 @@ def create_rssi_chart():
             showarrow=False
         )
     
-    rsu_ids = list(st.session_state.rssi_data.keys())
-    rssi_values = [data['rssi'] for data in st.session_state.rssi_data.values()]
-    
     # Color coding based on signal strength
-    colors = []
-    for rssi in rssi_values:
-        if rssi >= -60:
-            colors.append('green')
-        elif rssi >= -80:
-            colors.append('orange')
-        else:
-            colors.append('red')
+    colors = _RSSI_COLORS[np.digitize(rssi_values, _RSSI_COLOR_BINS)].tolist()
     
     fig = go.Figure(data=[
         go.Bar(
-            x=rsu_ids,
+            x=rsu_ids.tolist(),
             y=rssi_values,
             marker_color=colors,
-            text=[f"{rssi:.1f} dBm" for rssi in rssi_values],
+            text=np.char.mod('%.1f dBm', rssi_values).tolist(),
             textposition='auto',
         )
     ])
@@ -210,7 +308,7 @@ def create_rssi_chart():
     
     return fig
 
-def sidebar_configuration():
+def sidebar_configuration(snapshot):
     """Sidebar configuration panel"""
     with st.sidebar:
         st.header("⚙️ Configuration")
@@ -224,7 +322,9 @@ def sidebar_configuration():
             with col1:
                 if st.button("🔌 AWS IoT", type="primary", use_container_width=True):
                     with st.spinner("Connecting to AWS IoT..."):
-                        st.session_state.mqtt_handler = MQTTHandler(data_callback, demo_mode=False)
+                        st.session_state.mqtt_handler = MQTTHandler(
+                            make_data_callback(st.session_state.pending_positions), demo_mode=False
+                        )
                         st.session_state.connection_mode = 'aws_iot'
                         if st.session_state.mqtt_handler.connect():
                             st.session_state.mqtt_handler.start_background_processing()
@@ -238,7 +338,9 @@ def sidebar_configuration():
             with col2:
                 if st.button("🎮 Demo Mode", type="secondary", use_container_width=True):
                     with st.spinner("Starting demo mode..."):
-                        st.session_state.mqtt_handler = MQTTHandler(data_callback, demo_mode=True)
+                        st.session_state.mqtt_handler = MQTTHandler(
+                            make_data_callback(st.session_state.pending_positions), demo_mode=True
+                        )
                         st.session_state.connection_mode = 'demo'
                         if st.session_state.mqtt_handler.connect():
                             st.session_state.mqtt_handler.start_background_processing()
@@ -249,9 +351,8 @@ def sidebar_configuration():
                             st.session_state.mqtt_handler = None
                             st.session_state.connection_mode = None
         else:
-            status = st.session_state.mqtt_handler.get_connection_status()
-            if status['connected']:
-                st.success(f"✅ Connected: {status['client_type']}")
+            if snapshot and snapshot.connected:
+                st.success(f"✅ Connected: {snapshot.client_type}")
                 
                 if st.button("🔌 Disconnect"):
                     st.session_state.mqtt_handler.stop_background_processing()
@@ -293,16 +394,17 @@ def sidebar_configuration():
         # RSU positions
         st.subheader("RSU Positions")
         
-        new_rsu_positions = {}
+        rsu_coords = st.session_state.rsu_coords
+        new_rsu_coords = np.empty_like(rsu_coords)
         
-        for rsu_id in ['RSU1', 'RSU2', 'RSU3']:
+        for i, rsu_id in enumerate(config.field.RSU_IDS):
             col1, col2 = st.columns(2)
             with col1:
                 x = st.number_input(
                     f"{rsu_id} X",
                     min_value=0.0,
                     max_value=new_width,
-                    value=st.session_state.rsu_positions.get(rsu_id, (0, 0))[0],
+                    value=float(rsu_coords[i, 0]),
                     step=1.0,
                     key=f"{rsu_id}_x"
                 )
@@ -311,20 +413,20 @@ def sidebar_configuration():
                     f"{rsu_id} Y",
                     min_value=0.0,
                     max_value=new_height,
-                    value=st.session_state.rsu_positions.get(rsu_id, (0, 0))[1],
+                    value=float(rsu_coords[i, 1]),
                     step=1.0,
                     key=f"{rsu_id}_y"
                 )
             
-            new_rsu_positions[rsu_id] = (x, y)
+            new_rsu_coords[i] = (x, y)
         
         if st.button("📍 Apply Configuration", type="primary"):
             st.session_state.field_width = new_width
             st.session_state.field_height = new_height
-            st.session_state.rsu_positions = new_rsu_positions
+            st.session_state.rsu_coords = new_rsu_coords
             
             # Validate positions
-            errors = validate_rsu_positions(new_rsu_positions, new_width, new_height)
+            errors = validate_rsu_coords(config.field.RSU_IDS, new_rsu_coords, new_width, new_height)
             if errors:
                 for rsu_id, error in errors.items():
                     st.error(f"{rsu_id}: {error}")
@@ -348,25 +450,62 @@ def sidebar_configuration():
         )
         
         if st.button("🗑️ Clear Trail"):
-            st.session_state.position_data = []
+            st.session_state.pending_positions.clear()
+            st.session_state.position_buffer.clear()
+            st.session_state.position_flags = 0
             if st.session_state.mqtt_handler:
                 st.session_state.mqtt_handler.clear_history()
             st.success("Trail cleared!")
             st.rerun()
 
-def main_dashboard():
-    """Main dashboard content"""
-    # Header
-    st.markdown('<div class="main-header">🚧 Project Victoria Dashboard</div>', unsafe_allow_html=True)
-    
-    # Update data from MQTT handler
-    if st.session_state.mqtt_handler:
-        latest_data = st.session_state.mqtt_handler.get_latest_data()
-        if latest_data['position']:
-            # Update session state with latest data
-            st.session_state.rssi_data = latest_data['rssi_data']
-            st.session_state.position_data = latest_data['position_history']
-            st.session_state.last_update = datetime.now()
+def live_refresh_interval():
+    """Refresh interval for live fragments (None disables auto-refresh)"""
+    if st.session_state.auto_refresh:
+        return config.dashboard.update_interval
+    return None
+
+def take_snapshot():
+    """Get the newest MQTT handler snapshot, falling back to the last one seen"""
+    session = st.session_state
+    handler = session.mqtt_handler
+    if handler is None:
+        session.snapshot = None
+    else:
+        # Published by the handler thread, so this never blocks the render
+        snapshot = handler.poll_snapshot()
+        if snapshot is not None:
+            session.snapshot = snapshot
+        elif session.snapshot is None:
+            session.snapshot = handler.snapshot()
+    return session.snapshot
+
+def sync_mqtt_data():
+    """Pull the latest data from the MQTT handler into session state"""
+    session = st.session_state
+    drain_pending_positions()
+    
+    snapshot = take_snapshot()
+    if not (snapshot and snapshot.latest_position):
+        return
+    
+    # Only re-pull when the handler reports new data
+    data_key = (id(session.mqtt_handler), snapshot.version)
+    if session.data_key == data_key:
+        return
+    session.data_key = data_key
+    
+    # Update session state with latest data
+    rssi_data = snapshot.rssi_data
+    session.rssi_ids = np.array(list(rssi_data.keys()), dtype=str)
+    session.rssi_values = np.fromiter(
+        (data['rssi'] for data in rssi_data.values()), dtype=np.float32, count=len(rssi_data)
+    )
+    session.last_update = datetime.now()
+
+def field_view():
+    """Live fragment: field visualization and current status"""
+    session = st.session_state
+    sync_mqtt_data()
     
     # Main content area
     col1, col2 = st.columns([0.7, 0.3])
@@ -375,79 +514,118 @@ def main_dashboard():
         # Field visualization
         st.subheader("📍 Field Visualization")
         field_plot = create_field_plot()
-        st.plotly_chart(field_plot, use_container_width=True)
+        st.plotly_chart(field_plot, use_container_width=True, key="field_plot")
     
     with col2:
         # Current position info
         st.subheader("📊 Current Status")
         
-        if st.session_state.position_data:
-            latest_pos = st.session_state.position_data[-1]
+        # Fixed metric slots so the panel layout is identical with or without data
+        notice_slot = st.empty()
+        col2a, col2b = st.columns(2)
+        with col2a:
+            x_slot = st.empty()
+            y_slot = st.empty()
+        with col2b:
+            accuracy_slot = st.empty()
+            rate_slot = st.empty()
+        
+        latest_pos = session.position_buffer.latest()
+        if latest_pos is not None:
+            x, y, accuracy = latest_pos
+            data_rate = calculate_data_rate_from_timestamps(session.position_buffer.ts_view())
+            
+            x_slot.metric("X Position", f"{x:.2f} m")
+            y_slot.metric("Y Position", f"{y:.2f} m")
+            accuracy_slot.metric("Accuracy", f"±{accuracy:.1f} m")
+            rate_slot.metric("Data Rate", f"{data_rate:.1f} Hz")
             
-            col2a, col2b = st.columns(2)
-            with col2a:
-                st.metric("X Position", f"{latest_pos['x']:.2f} m")
-                st.metric("Y Position", f"{latest_pos['y']:.2f} m")
-            with col2b:
-                st.metric("Accuracy", f"±{latest_pos['accuracy']:.1f} m")
-                data_rate = calculate_data_rate(st.session_state.position_data)
-                st.metric("Data Rate", f"{data_rate:.1f} Hz")
+            # Warning text is only built when the latest position failed a check
+            if session.position_flags:
+                notice_slot.warning("\n\n".join(
+                    describe_position_flags(session.position_flags, x, y, accuracy)
+                ))
         else:
-            st.info("No position data available")
+            notice_slot.info("No position data available")
+            x_slot.metric("X Position", "—")
+            y_slot.metric("Y Position", "—")
+            accuracy_slot.metric("Accuracy", "—")
+            rate_slot.metric("Data Rate", "—")
         
         # RSSI display
         st.subheader("📡 RSSI Values")
-        if st.session_state.rssi_data:
-            for rsu_id, data in st.session_state.rssi_data.items():
-                rssi_str = format_rssi_for_display(data['rssi'])
-                st.markdown(f"**{rsu_id}:** `{rssi_str}`")
+        rssi_values = session.rssi_values
+        if rssi_values.size:
+            st.markdown("\n\n".join(
+                f"**{rsu_id}:** `{format_rssi_for_display(rssi)}`"
+                for rsu_id, rssi in zip(session.rssi_ids, rssi_values)
+            ))
         else:
             st.info("No RSSI data available")
-    
-    # RSSI chart
+
+def rssi_view():
+    """Live fragment: RSSI signal strength chart"""
+    session = st.session_state
     st.subheader("📈 Signal Strength")
-    rssi_chart = create_rssi_chart()
-    st.plotly_chart(rssi_chart, use_container_width=True)
-    
-    # Status bar
-    st.divider()
     
+    # RSSI arrays are only replaced when a new snapshot arrives
+    if session.rssi_fig_source is not session.rssi_values:
+        session.rssi_fig = create_rssi_chart()
+        session.rssi_fig_source = session.rssi_values
+    st.plotly_chart(session.rssi_fig, use_container_width=True, key="rssi_chart")
+
+def status_bar():
+    """Live fragment: connection status bar"""
+    session = st.session_state
     status_col1, status_col2, status_col3 = st.columns(3)
     
     with status_col1:
-        if st.session_state.mqtt_handler:
-            status = st.session_state.mqtt_handler.get_connection_status()
-            if status['connected']:
-                st.markdown(f'<span class="status-connected">● Connected to {status["client_type"]}</span>', unsafe_allow_html=True)
+        snapshot = session.snapshot
+        if snapshot:
+            if snapshot.connected:
+                st.markdown(f'<span class="status-connected">● Connected to {snapshot.client_type}</span>', unsafe_allow_html=True)
             else:
                 st.markdown('<span class="status-disconnected">● Disconnected</span>', unsafe_allow_html=True)
         else:
             st.markdown('<span class="status-disconnected">● Not Connected</span>', unsafe_allow_html=True)
     
     with status_col2:
-        if st.session_state.last_update:
-            st.text(f"Last Update: {st.session_state.last_update.strftime('%H:%M:%S')}")
+        if session.last_update:
+            st.text(f"Last Update: {session.last_update.strftime('%H:%M:%S')}")
         else:
             st.text("Last Update: Never")
     
     with status_col3:
-        data_points = len(st.session_state.position_data)
+        data_points = len(session.position_buffer)
         st.text(f"Data Points: {data_points}")
 
+def main_dashboard():
+    """Main dashboard content"""
+    # Header
+    st.markdown('<div class="main-header">🚧 Project Victoria Dashboard</div>', unsafe_allow_html=True)
+    
+    # Live sections rerun on their own timer; the sidebar only reruns on user input
+    run_every = live_refresh_interval()
+    
+    st.fragment(field_view, run_every=run_every)()
+    
+    # RSSI chart
+    st.fragment(rssi_view, run_every=run_every)()
+    
+    # Status bar
+    st.divider()
+    st.fragment(status_bar, run_every=run_every)()
+
 def main():
     """Main application function"""
+    inject_custom_css()
     init_session_state()
     
     # Sidebar configuration
-    sidebar_configuration()
+    sidebar_configuration(take_snapshot())
     
     # Main dashboard
     main_dashboard()
-    
-    # Auto-refresh
-    if st.session_state.auto_refresh:
-        time.sleep(config.dashboard.update_interval)
-        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,8 +2,15 @@
 Configuration management for Project Victoria Dashboard
 """
 import os
-from dataclasses import dataclass
-from typing import Dict, Tuple
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+DEFAULT_RSU_POSITIONS = MappingProxyType({
+    "RSU1": (10.0, 10.0),
+    "RSU2": (90.0, 10.0),
+    "RSU3": (50.0, 65.0)
+})
 
 @dataclass
 class AWSIoTConfig:
@@ -20,21 +27,21 @@ class FieldConfig:
     """Field configuration for the construction site"""
     width: float = 100.0  # meters
     height: float = 75.0  # meters
-    rsu_positions: Dict[str, Tuple[float, float]] = None
+    # Shared read-only default; assign a new mapping to change RSU positions
+    rsu_positions: Mapping[str, Tuple[float, float]] = field(
+        default_factory=lambda: DEFAULT_RSU_POSITIONS
+    )
     
-    def __post_init__(self):
-        if self.rsu_positions is None:
-            self.rsu_positions = {
-                "RSU1": (10.0, 10.0),
-                "RSU2": (90.0, 10.0),
-                "RSU3": (50.0, 65.0)
-            }
+    # Fixed RSU order used for array-based (SoA) RSU coordinates
+    RSU_IDS = ("RSU1", "RSU2", "RSU3")
 
 @dataclass
 class DashboardConfig:
     """Dashboard configuration"""
     update_interval: float = 0.1  # seconds (10 Hz)
+    max_solve_hz: float = 10.0  # Upper bound on position solves from live RSSI messages
     max_trail_points: int = 100
+    trail_render_points: int = 500  # Longer trails are downsampled for display
     rssi_threshold: float = -90.0  # dBm
     position_accuracy_threshold: float = 5.0  # meters
 
@@ -1,11 +1,177 @@
 """
 Data processing utilities for Project Victoria Dashboard
 """
-import pandas as pd
+import csv
+import io
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Dict, Tuple, Optional
-import json
+import math
+
+from _jit import njit
+
+class PositionBuffer:
+    """
+    Fixed-size ring buffer of position samples stored as parallel arrays
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.xs = np.empty(capacity, dtype=np.float32)
+        self.ys = np.empty(capacity, dtype=np.float32)
+        self.accuracy = np.empty(capacity, dtype=np.float32)
+        self.ts = np.empty(capacity, dtype=np.float64)  # Epoch seconds
+        self.head = 0
+        self.count = 0
+        self.version = 0  # Bumped on every change, usable as a cache key
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def append(self, x: float, y: float, accuracy: float, ts: float):
+        """Add a position sample, overwriting the oldest one when full"""
+        self.xs[self.head] = x
+        self.ys[self.head] = y
+        self.accuracy[self.head] = accuracy
+        self.ts[self.head] = ts
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.version += 1
+    
+    def extend(self, samples: np.ndarray):
+        """
+        Add a batch of position samples with one vector write per column
+        
+        Args:
+            samples: float64 array of shape (n, 4) with x, y, accuracy and
+                epoch timestamp columns
+        """
+        n = len(samples)
+        if n == 0:
+            return
+        
+        columns = (self.xs, self.ys, self.accuracy, self.ts)
+        
+        if n >= self.capacity:
+            for i, column in enumerate(columns):
+                column[:] = samples[-self.capacity:, i]
+            self.head = 0
+            self.count = self.capacity
+            self.version += 1
+            return
+        
+        end = self.head + n
+        for i, column in enumerate(columns):
+            if end <= self.capacity:
+                column[self.head:end] = samples[:, i]
+            else:
+                split = self.capacity - self.head
+                column[self.head:] = samples[:split, i]
+                column[:end - self.capacity] = samples[split:, i]
+        
+        self.head = end % self.capacity
+        self.count = min(self.count + n, self.capacity)
+        self.version += 1
+    
+    def clear(self):
+        """Drop all samples"""
+        self.head = 0
+        self.count = 0
+        self.version += 1
+    
+    def _ordered(self, column: np.ndarray) -> np.ndarray:
+        """Get a column's buffered values in chronological order"""
+        if self.count < self.capacity:
+            return column[:self.count]
+        return np.concatenate((column[self.head:], column[:self.head]))
+    
+    def trail(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get buffered positions in chronological order
+        
+        Returns:
+            Tuple of (xs, ys) arrays
+        """
+        return self._ordered(self.xs), self._ordered(self.ys)
+    
+    def ts_view(self) -> np.ndarray:
+        """Get buffered epoch timestamps in chronological order"""
+        return self._ordered(self.ts)
+    
+    def latest(self) -> Optional[Tuple[float, float, float]]:
+        """Get the most recent (x, y, accuracy) sample or None if empty"""
+        if self.count == 0:
+            return None
+        i = self.head - 1
+        return float(self.xs[i]), float(self.ys[i]), float(self.accuracy[i])
+
+@njit(cache=True)
+def _lttb_indices(xs, ys, threshold):
+    """Pick the indices kept by Largest-Triangle-Three-Buckets"""
+    n = xs.shape[0]
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[threshold - 1] = n - 1
+    
+    # First and last points are always kept, the rest is split into buckets
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    
+    for i in range(threshold - 2):
+        # Average point of the next bucket
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = 0.0
+        avg_y = 0.0
+        for j in range(next_start, next_end):
+            avg_x += xs[j]
+            avg_y += ys[j]
+        avg_x /= next_end - next_start
+        avg_y /= next_end - next_start
+        
+        # Point of the current bucket forming the largest triangle
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        max_area = -1.0
+        chosen = start
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > max_area:
+                max_area = area
+                chosen = j
+        
+        indices[i + 1] = chosen
+        a = chosen
+    
+    return indices
+
+def downsample_trail(xs: np.ndarray, ys: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Downsample a position trail for display using LTTB
+    
+    Args:
+        xs: Trail x coordinates in chronological order
+        ys: Trail y coordinates in chronological order
+        threshold: Maximum number of points to keep
+        
+    Returns:
+        Tuple of (xs, ys), unchanged if the trail is already short enough
+    """
+    if threshold < 3 or len(xs) <= threshold:
+        return xs, ys
+    
+    indices = _lttb_indices(xs, ys, threshold)
+    return xs[indices], ys[indices]
+
+# (quality, bars) per signal bucket, strongest first
+_RSSI_DISPLAY_LUT = (
+    ("Excellent", "█████████"),
+    ("Very Good", "████████▒"),
+    ("Good", "██████▒▒▒"),
+    ("Fair", "████▒▒▒▒▒"),
+    ("Poor", "██▒▒▒▒▒▒▒"),
+    ("Very Poor", "▒▒▒▒▒▒▒▒▒"),
+)
 
 def format_rssi_for_display(rssi_value: float) -> str:
     """
@@ -17,27 +183,44 @@ def format_rssi_for_display(rssi_value: float) -> str:
     Returns:
         Formatted string with signal quality indicator
     """
-    if rssi_value >= -50:
-        quality = "Excellent"
-        bars = "█████████"
-    elif rssi_value >= -60:
-        quality = "Very Good"
-        bars = "████████▒"
-    elif rssi_value >= -70:
-        quality = "Good"
-        bars = "██████▒▒▒"
-    elif rssi_value >= -80:
-        quality = "Fair"
-        bars = "████▒▒▒▒▒"
-    elif rssi_value >= -90:
-        quality = "Poor"
-        bars = "██▒▒▒▒▒▒▒"
+    # One 10 dB bucket per step below -50 dBm, bucket 0 at or above it;
+    # NaN (no reading) and infinities fall into the lowest bucket
+    if not math.isfinite(rssi_value):
+        index = len(_RSSI_DISPLAY_LUT) - 1
     else:
-        quality = "Very Poor"
-        bars = "▒▒▒▒▒▒▒▒▒"
+        index = max(0, min(5, math.ceil((-50 - rssi_value) / 10)))
+    quality, bars = _RSSI_DISPLAY_LUT[index]
     
     return f"{rssi_value:.1f} dBm {bars} ({quality})"
 
+def timestamp_to_epoch(timestamp) -> float:
+    """
+    Convert a timestamp to epoch seconds
+    
+    Args:
+        timestamp: Epoch seconds or an ISO 8601 string
+        
+    Returns:
+        Epoch seconds
+    """
+    if isinstance(timestamp, str):
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+    return float(timestamp)
+
+def format_timestamp(timestamp) -> str:
+    """
+    Format a timestamp for display
+    
+    Args:
+        timestamp: Epoch seconds or an ISO 8601 string (returned unchanged)
+        
+    Returns:
+        ISO 8601 string
+    """
+    if isinstance(timestamp, str):
+        return timestamp
+    return datetime.fromtimestamp(timestamp).isoformat()
+
 def calculate_data_rate(position_history: List[Dict]) -> float:
     """
     Calculate data update rate from position history
@@ -54,32 +237,47 @@ def calculate_data_rate(position_history: List[Dict]) -> float:
     try:
         # Get timestamps from last 10 data points
         recent_data = position_history[-10:]
-        timestamps = []
+        epochs = []
         
         for data in recent_data:
             if 'timestamp' in data:
-                timestamp = datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00'))
-                timestamps.append(timestamp)
-        
-        if len(timestamps) < 2:
-            return 0.0
-        
-        # Calculate average time difference
-        time_diffs = []
-        for i in range(1, len(timestamps)):
-            diff = (timestamps[i] - timestamps[i-1]).total_seconds()
-            if diff > 0:
-                time_diffs.append(diff)
+                epochs.append(timestamp_to_epoch(data['timestamp']))
         
-        if time_diffs:
-            avg_interval = sum(time_diffs) / len(time_diffs)
-            return 1.0 / avg_interval if avg_interval > 0 else 0.0
+        return calculate_data_rate_from_timestamps(np.array(epochs, dtype=np.float64))
         
     except Exception:
         pass
     
     return 0.0
 
+@njit(cache=True, fastmath=True)
+def _data_rate(ts):
+    """Average rate over consecutive timestamps, skipping non-increasing steps"""
+    total = 0.0
+    n = 0
+    for i in range(1, ts.shape[0]):
+        diff = ts[i] - ts[i - 1]
+        if diff > 0:
+            total += diff
+            n += 1
+    
+    if n == 0:
+        return 0.0
+    return n / total
+
+def calculate_data_rate_from_timestamps(timestamps: np.ndarray) -> float:
+    """
+    Calculate data update rate from epoch timestamps
+    
+    Args:
+        timestamps: Epoch seconds in chronological order
+        
+    Returns:
+        Data rate in Hz over the last 10 data points
+    """
+    recent = np.ascontiguousarray(timestamps[-10:], dtype=np.float64)
+    return float(_data_rate(recent))
+
 def export_data_to_csv(position_history: List[Dict], 
                       rssi_data: Dict,
                       filename: Optional[str] = None) -> str:
@@ -97,28 +295,36 @@ def export_data_to_csv(position_history: List[Dict],
     if filename is None:
         filename = f"project_victoria_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
-    # Prepare data for CSV
-    csv_data = []
+    # Columns: fixed position fields, then per-RSU fields in first-seen order
+    fieldnames = {'timestamp': None, 'x_position': None, 'y_position': None, 'accuracy': None}
+    for entry in position_history:
+        for rsu_id in entry.get('rssi_data', ()):
+            fieldnames[f'{rsu_id}_rssi'] = None
+            fieldnames[f'{rsu_id}_timestamp'] = None
+    
+    # Stream rows straight into the output buffer
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(fieldnames), restval='', lineterminator='\n')
+    writer.writeheader()
     
     for entry in position_history:
         row = {
-            'timestamp': entry.get('timestamp', ''),
+            'timestamp': format_timestamp(entry['timestamp']) if 'timestamp' in entry else '',
             'x_position': entry.get('x', ''),
             'y_position': entry.get('y', ''),
             'accuracy': entry.get('accuracy', ''),
         }
         
         # Add RSSI data if available
-        if 'rssi_data' in entry:
-            for rsu_id, rsu_data in entry['rssi_data'].items():
-                row[f'{rsu_id}_rssi'] = rsu_data.get('rssi', '')
-                row[f'{rsu_id}_timestamp'] = rsu_data.get('timestamp', '')
+        for rsu_id, rsu_data in entry.get('rssi_data', {}).items():
+            row[f'{rsu_id}_rssi'] = rsu_data.get('rssi', '')
+            row[f'{rsu_id}_timestamp'] = (
+                format_timestamp(rsu_data['timestamp']) if 'timestamp' in rsu_data else ''
+            )
         
-        csv_data.append(row)
+        writer.writerow(row)
     
-    # Convert to DataFrame and then to CSV
-    df = pd.DataFrame(csv_data)
-    csv_string = df.to_csv(index=False)
+    csv_string = buffer.getvalue()
     
     return csv_string
 
@@ -172,8 +378,75 @@ def validate_position_data(position_data: Dict) -> List[str]:
     # Check timestamp format
     if 'timestamp' in position_data:
         try:
-            datetime.fromisoformat(position_data['timestamp'].replace('Z', '+00:00'))
-        except ValueError:
+            timestamp_to_epoch(position_data['timestamp'])
+        except (ValueError, TypeError, OverflowError):
             warnings.append("Invalid timestamp format")
     
-    return warnings
\ No newline at end of file
+    return warnings
+
+# Bit flags reported by validate_position_batch
+POSITION_X_OUT_OF_RANGE = 1
+POSITION_Y_OUT_OF_RANGE = 2
+POSITION_NEGATIVE_ACCURACY = 4
+POSITION_POOR_ACCURACY = 8
+
+@njit(cache=True)
+def _validate_batch(xs, ys, accuracy):
+    """Range-check position columns, one flag byte per sample"""
+    n = xs.shape[0]
+    flags = np.zeros(n, dtype=np.uint8)
+    for i in range(n):
+        if xs[i] < -1000 or xs[i] > 1000:
+            flags[i] |= POSITION_X_OUT_OF_RANGE
+        if ys[i] < -1000 or ys[i] > 1000:
+            flags[i] |= POSITION_Y_OUT_OF_RANGE
+        if accuracy[i] < 0:
+            flags[i] |= POSITION_NEGATIVE_ACCURACY
+        elif accuracy[i] > 100:
+            flags[i] |= POSITION_POOR_ACCURACY
+    return flags
+
+def validate_position_batch(xs: np.ndarray, ys: np.ndarray, accuracy: np.ndarray) -> np.ndarray:
+    """
+    Validate a batch of positions stored as parallel arrays
+    
+    Applies the same range checks as validate_position_data. Timestamps are
+    parsed once at ingest, so they are not checked here.
+    
+    Args:
+        xs: X coordinates
+        ys: Y coordinates
+        accuracy: Accuracy estimates in meters
+        
+    Returns:
+        uint8 array of POSITION_* bit flags per sample (0 means valid)
+    """
+    return _validate_batch(
+        np.asarray(xs, dtype=np.float64),
+        np.asarray(ys, dtype=np.float64),
+        np.asarray(accuracy, dtype=np.float64)
+    )
+
+def describe_position_flags(flags: int, x: float, y: float, accuracy: float) -> List[str]:
+    """
+    Turn validate_position_batch flags for one sample into warning messages
+    
+    Args:
+        flags: POSITION_* bit flags of the sample
+        x: X coordinate of the sample
+        y: Y coordinate of the sample
+        accuracy: Accuracy estimate of the sample
+        
+    Returns:
+        List of validation warnings, worded like validate_position_data
+    """
+    warnings = []
+    if flags & POSITION_X_OUT_OF_RANGE:
+        warnings.append(f"X coordinate seems unreasonable: {x}")
+    if flags & POSITION_Y_OUT_OF_RANGE:
+        warnings.append(f"Y coordinate seems unreasonable: {y}")
+    if flags & POSITION_NEGATIVE_ACCURACY:
+        warnings.append("Accuracy cannot be negative")
+    if flags & POSITION_POOR_ACCURACY:
+        warnings.append(f"Accuracy seems very poor: ±{accuracy:.1f}m")
+    return warnings
@@ -1,7 +1,8 @@
 """
 Field configuration utilities for Project Victoria Dashboard
 """
-from typing import Dict, Tuple
+import numpy as np
+from typing import Dict, Sequence, Tuple
 
 def validate_rsu_positions(positions: Dict[str, Tuple[float, float]], 
                           field_width: float, 
@@ -14,21 +15,45 @@ def validate_rsu_positions(positions: Dict[str, Tuple[float, float]],
         field_width: Field width in meters
         field_height: Field height in meters
         
+    Returns:
+        Dictionary mapping RSU ID to error message (empty if valid)
+    """
+    rsu_ids = list(positions.keys())
+    coords = np.array(list(positions.values()), dtype=np.float64).reshape(-1, 2)
+    return validate_rsu_coords(rsu_ids, coords, field_width, field_height)
+
+def validate_rsu_coords(rsu_ids: Sequence[str],
+                        coords: np.ndarray,
+                        field_width: float,
+                        field_height: float) -> Dict[str, str]:
+    """
+    Validate RSU coordinates stored as an array within field boundaries
+    
+    Args:
+        rsu_ids: RSU IDs, one per row of coords
+        coords: Array of shape (N, 2) with x, y coordinates
+        field_width: Field width in meters
+        field_height: Field height in meters
+        
     Returns:
         Dictionary mapping RSU ID to error message (empty if valid)
     """
     errors = {}
     
-    for rsu_id, (x, y) in positions.items():
+    # Check all RSUs at once; only violators go through string formatting
+    bounds = np.array([field_width, field_height], dtype=np.float64)
+    out_of_bounds = (coords < 0) | (coords > bounds)
+    
+    for i in np.flatnonzero(out_of_bounds.any(axis=1)):
+        x, y = coords[i]
         rsu_errors = []
         
-        if x < 0 or x > field_width:
+        if out_of_bounds[i, 0]:
             rsu_errors.append(f"X coordinate ({x:.1f}m) outside field bounds (0-{field_width}m)")
         
-        if y < 0 or y > field_height:
+        if out_of_bounds[i, 1]:
             rsu_errors.append(f"Y coordinate ({y:.1f}m) outside field bounds (0-{field_height}m)")
         
-        if rsu_errors:
-            errors[rsu_id] = "; ".join(rsu_errors)
+        errors[rsu_ids[i]] = "; ".join(rsu_errors)
     
-    return errors
\ No newline at end of file
+    return errors
@@ -6,9 +6,11 @@ import json
 import logging
 import threading
 import time
-from datetime import datetime
-from typing import Dict, Callable, Optional
-import queue
+from typing import Dict, List, Callable, Mapping, NamedTuple, Optional
+from types import MappingProxyType
+from collections import deque
+
+import numpy as np
 
 try:
     from AWSIoTPythonSDK.MQTTLib import AWSIoTMQTTClient
@@ -17,8 +19,15 @@ except ImportError:
     AWS_IOT_AVAILABLE = False
     logging.warning("AWSIoTPythonSDK not available, using mock MQTT client")
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 from config import config
 from trilateration import RSSITrilaterationSolver, PositionFilter
+from data_processing import format_timestamp
 
 class MockMQTTClient:
     """Mock MQTT client for testing without AWS IoT"""
@@ -61,6 +70,14 @@ class MockMQTTClient:
     def publish(self, topic, payload, qos):
         pass
 
+class HandlerSnapshot(NamedTuple):
+    """Immutable view of the handler state for one dashboard refresh"""
+    connected: bool
+    client_type: str
+    latest_position: Optional[Dict]
+    rssi_data: Mapping
+    version: int
+
 class MQTTHandler:
     """
     Handles MQTT communication with AWS IoT Core for Project Victoria
@@ -73,16 +90,37 @@ class MQTTHandler:
         self.connected = False
         self.running = False
         self.thread = None
-        self.data_queue = queue.Queue()
+        self.snapshot_queue = deque(maxlen=1)  # Latest snapshot only; append/popleft are thread-safe
+        self.version = 0  # Incremented whenever position data changes
+        self._history_copy = []
+        self._history_copy_version = 0
         
         # Initialize trilateration solver and filter
         self.trilateration_solver = RSSITrilaterationSolver()
-        self.position_filter = PositionFilter()
+        self.position_filter = PositionFilter(nominal_dt=config.dashboard.update_interval)
         
         # Data storage
         self.latest_rssi_data = {}
+        self._rssi_view = None  # Read-only copy of latest_rssi_data, rebuilt after changes
+        
+        # Latest RSSI per configured RSU as parallel arrays, indexed like _rsu_ids
+        self._rsu_ids = list(config.field.rsu_positions.keys())
+        self._rsu_index = {rsu_id: i for i, rsu_id in enumerate(self._rsu_ids)}
+        self._rsu_xy = np.array(
+            [config.field.rsu_positions[rsu_id] for rsu_id in self._rsu_ids], dtype=np.float64
+        )
+        self._rssi = np.full(len(self._rsu_ids), np.nan, dtype=np.float64)
+        self._rssi_valid = np.zeros(len(self._rsu_ids), dtype=bool)
+        self._rssi_lock = threading.Lock()  # Guards _rssi and _rssi_valid across threads
+        self._rng = np.random.default_rng()  # Demo mode noise
+        
+        # Live RSSI messages are coalesced so at most max_solve_hz solves run per second
+        self._solve_min_period = 1.0 / config.dashboard.max_solve_hz
+        self._last_solve_mono = 0.0
+        self._solve_pending = False
+        self._solve_lock = threading.Lock()
         self.latest_position = None
-        self.position_history = []
+        self.position_history = deque(maxlen=config.dashboard.max_trail_points)
         
         self._setup_logging()
     
@@ -123,8 +161,12 @@ class MQTTHandler:
     def _on_rssi_message(self, client, userdata, message):
         """Callback for RSSI data messages"""
         try:
-            payload = json.loads(message.payload.decode('utf-8'))
-            self.logger.debug(f"Received RSSI data: {payload}")
+            if ORJSON_AVAILABLE:
+                payload = orjson.loads(message.payload)  # Parses bytes directly
+            else:
+                payload = json.loads(message.payload.decode('utf-8'))
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Received RSSI data: {payload}")
             
             # Expected payload format:
             # {
@@ -136,33 +178,74 @@ class MQTTHandler:
             # }
             
             if 'rsu_id' in payload and 'rssi' in payload:
-                self.latest_rssi_data[payload['rsu_id']] = {
-                    'rssi': payload['rssi'],
-                    'timestamp': payload.get('timestamp', datetime.now().isoformat()),
-                    'obu_id': payload.get('obu_id', 'unknown')
-                }
+                self._store_rssi(
+                    payload['rsu_id'],
+                    payload['rssi'],
+                    payload.get('timestamp') or time.time(),
+                    payload.get('obu_id', 'unknown')
+                )
                 
-                # Trigger position calculation if we have enough data
-                if len(self.latest_rssi_data) >= 3:
-                    self._calculate_position()
+                # Trigger position calculation unless one ran very recently
+                self._solve_pending = True
+                self._maybe_solve()
                 
         except json.JSONDecodeError as e:
             self.logger.error(f"Failed to decode RSSI message: {e}")
         except Exception as e:
             self.logger.error(f"Error processing RSSI message: {e}")
     
+    def _store_rssi(self, rsu_id: str, rssi: float, timestamp, obu_id: str):
+        """Record the latest RSSI reading of an RSU"""
+        self.latest_rssi_data[rsu_id] = {
+            'rssi': rssi,
+            'timestamp': timestamp,
+            'obu_id': obu_id
+        }
+        self._rssi_view = None
+        
+        # RSUs without a configured position can't be used for trilateration
+        index = self._rsu_index.get(rsu_id)
+        if index is not None:
+            with self._rssi_lock:
+                self._rssi[index] = rssi
+                self._rssi_valid[index] = True
+    
+    @property
+    def _rssi_count(self) -> int:
+        """Number of configured RSUs with an RSSI reading"""
+        return int(np.count_nonzero(self._rssi_valid))
+    
+    def _maybe_solve(self):
+        """Run a pending position calculation once the minimum solve period has elapsed"""
+        if not self._solve_pending or self._rssi_count < 3:
+            return
+        if time.monotonic() - self._last_solve_mono < self._solve_min_period:
+            return
+        
+        # Another thread is already solving with the same readings
+        if not self._solve_lock.acquire(blocking=False):
+            return
+        try:
+            self._calculate_position()
+        finally:
+            self._solve_lock.release()
+    
     def _calculate_position(self):
         """Calculate OBU position from latest RSSI data"""
+        self._solve_pending = False
+        self._last_solve_mono = time.monotonic()
         try:
-            # Extract RSSI values
-            rssi_measurements = {}
-            for rsu_id, data in self.latest_rssi_data.items():
-                rssi_measurements[rsu_id] = data['rssi']
+            # Consistent copy of the RSUs heard so far, as readings keep arriving
+            with self._rssi_lock:
+                mask = self._rssi_valid.copy()
+                rssi = self._rssi[mask]
+            if np.count_nonzero(mask) < 3:
+                return
             
-            # Calculate position using trilateration
-            result = self.trilateration_solver.calculate_position(
-                config.field.rsu_positions,
-                rssi_measurements,
+            # Calculate position using trilateration on the RSUs heard so far
+            result = self.trilateration_solver.calculate_position_arrays(
+                self._rsu_xy[mask],
+                rssi,
                 method='least_squares'
             )
             
@@ -171,27 +254,26 @@ class MQTTHandler:
                 
                 # Apply position filter
                 current_time = time.time()
-                filtered_position = self.position_filter.update((x, y), current_time)
+                filtered_position = self.position_filter.update(x, y, current_time)
                 
                 position_data = {
                     'x': filtered_position[0],
                     'y': filtered_position[1],
                     'accuracy': accuracy,
-                    'timestamp': datetime.now().isoformat(),
-                    'rssi_data': dict(self.latest_rssi_data)
+                    'timestamp': current_time,  # Epoch seconds, formatted only for display
+                    'rssi_data': self._rssi_data_view()
                 }
                 
                 self.latest_position = position_data
-                self.position_history.append(position_data)
-                
-                # Limit history size
-                if len(self.position_history) > config.dashboard.max_trail_points:
-                    self.position_history = self.position_history[-config.dashboard.max_trail_points:]
+                self.position_history.append(position_data)  # Oldest entry drops off when full
+                self.version += 1
                 
                 # Call data callback if provided
                 if self.data_callback:
                     self.data_callback(position_data)
                 
+                self._publish_snapshot()
+                
                 self.logger.info(f"Position calculated: ({x:.2f}, {y:.2f}) ±{accuracy:.2f}m")
                 
         except Exception as e:
@@ -212,6 +294,7 @@ class MQTTHandler:
                 self.client.subscribe(rssi_topic, 1, self._on_rssi_message)
                 
                 self.logger.info(f"Connected to AWS IoT and subscribed to {rssi_topic}")
+                self._publish_snapshot()
                 return True
             else:
                 self.logger.error("Failed to connect to AWS IoT")
@@ -227,6 +310,7 @@ class MQTTHandler:
             self.client.disconnect()
             self.connected = False
             self.logger.info("Disconnected from AWS IoT")
+            self._publish_snapshot()
     
     def start_background_processing(self):
         """Start background processing thread"""
@@ -255,6 +339,9 @@ class MQTTHandler:
                 # Simulate RSSI data for demo purposes if using mock client
                 if self.demo_mode or isinstance(self.client, MockMQTTClient):
                     self._simulate_rssi_data()
+                else:
+                    # Flush readings held back by the solve throttle
+                    self._maybe_solve()
                 
                 time.sleep(config.dashboard.update_interval)
                 
@@ -263,48 +350,6 @@ class MQTTHandler:
     
     def _simulate_rssi_data(self):
         """Simulate RSSI data for demo purposes"""
-        import random
-        import math
-        
-        # Simple geometric simulation - no complex RSSI model
-        current_time = time.time()
-        
-        # Circular motion pattern within field bounds
-        angle = (current_time * 0.1) % (2 * math.pi)
-        field_width = config.field.width
-        field_height = config.field.height
-        center_x, center_y = field_width / 2, field_height / 2
-        radius = min(field_width, field_height) * 0.2
-        
-        # TRUE OBU position (what we want to show)
-        true_x = center_x + radius * math.cos(angle)
-        true_y = center_y + radius * math.sin(angle)
-        
-        # Create fake but consistent position data directly
-        position_data = {
-            'x': true_x,
-            'y': true_y,
-            'accuracy': random.uniform(1.0, 3.0),  # Realistic accuracy
-            'timestamp': datetime.now().isoformat(),
-            'rssi_data': {}
-        }
-        
-        # Generate fake RSSI values for display only
-        for rsu_id, (rsu_x, rsu_y) in config.field.rsu_positions.items():
-            distance = math.sqrt((true_x - rsu_x)**2 + (true_y - rsu_y)**2)
-            # Simple fake RSSI based on distance (for display only)
-            fake_rssi = -40 - (distance * 0.5) + random.gauss(0, 2)
-            
-            self.latest_rssi_data[rsu_id] = {
-                'rssi': fake_rssi,
-                'timestamp': datetime.now().isoformat(),
-                'obu_id': 'OBU_DEMO'
-            }
-            position_data['rssi_data'][rsu_id] = self.latest_rssi_data[rsu_id]
-        
-    def _simulate_rssi_data(self):
-        """Simulate RSSI data for demo purposes"""
-        import random
         import math
         
         # Simulate an OBU moving in a simple pattern
@@ -320,69 +365,114 @@ class MQTTHandler:
         true_x = center_x + radius * math.cos(angle)
         true_y = center_y + radius * math.sin(angle)
         
-        print(f"DEBUG: Simulated TRUE position: ({true_x:.2f}, {true_y:.2f})")
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self.logger.debug(f"Simulated true position: ({true_x:.2f}, {true_y:.2f})")
         
-        # Simulate RSSI measurements based on distance to each RSU
-        for rsu_id, (rsu_x, rsu_y) in config.field.rsu_positions.items():
-            distance = math.sqrt((true_x - rsu_x)**2 + (true_y - rsu_y)**2)
-            
-            # Convert distance to RSSI with some noise
-            true_rssi = self.trilateration_solver.tx_power - 10 * self.trilateration_solver.path_loss_exponent * math.log10(distance)
-            noisy_rssi = true_rssi + random.gauss(0, 3)  # 3 dB noise
-            
-            print(f"DEBUG: {rsu_id} at ({rsu_x}, {rsu_y}) - distance: {distance:.2f}m, RSSI: {noisy_rssi:.1f} dBm")
-            
-            self.latest_rssi_data[rsu_id] = {
-                'rssi': noisy_rssi,
-                'timestamp': datetime.now().isoformat(),
-                'obu_id': 'OBU_DEMO'
-            }
+        # Simulate RSSI measurements based on distance to each RSU, all RSUs at once
+        rsu_xy = self._rsu_xy
+        solver = self.trilateration_solver
+        distance = np.hypot(true_x - rsu_xy[:, 0], true_y - rsu_xy[:, 1])
+        true_rssi = solver.tx_power - 10 * solver.path_loss_exponent * np.log10(distance)
+        noisy_rssi = true_rssi + self._rng.normal(0.0, 3.0, size=distance.shape[0])  # 3 dB noise
         
-        # Trigger position calculation
-        if len(self.latest_rssi_data) >= 3:
-            self._calculate_position()
-            
-            # Convert distance to RSSI with some noise
-            true_rssi = self.trilateration_solver.tx_power - 10 * self.trilateration_solver.path_loss_exponent * math.log10(distance)
-            noisy_rssi = true_rssi + random.gauss(0, 3)  # 3 dB noise
-            
-            self.latest_rssi_data[rsu_id] = {
-                'rssi': noisy_rssi,
-                'timestamp': datetime.now().isoformat(),
+        with self._rssi_lock:
+            self._rssi[:] = noisy_rssi
+            self._rssi_valid[:] = True
+        
+        # Per-RSU records for display
+        timestamp = time.time()
+        rssi_map = self.latest_rssi_data
+        log_debug = self.logger.debug
+        for rsu_id, rssi, rsu_distance in zip(self._rsu_ids, noisy_rssi.tolist(), distance.tolist()):
+            if debug:
+                log_debug(f"{rsu_id} - distance: {rsu_distance:.2f}m, RSSI: {rssi:.1f} dBm")
+            rssi_map[rsu_id] = {
+                'rssi': rssi,
+                'timestamp': timestamp,
                 'obu_id': 'OBU_DEMO'
             }
+        self._rssi_view = None
         
         # Trigger position calculation
-        if len(self.latest_rssi_data) >= 3:
+        if self._rssi_count >= 3:
             self._calculate_position()
     
     def get_latest_data(self) -> Dict:
         """Get latest position and RSSI data"""
         return {
             'position': self.latest_position,
-            'rssi_data': dict(self.latest_rssi_data),
-            'position_history': list(self.position_history),
+            'rssi_data': self._rssi_data_view(),
+            'position_history': self._history_list(),
             'connected': self.connected
         }
     
     def clear_history(self):
         """Clear position history"""
         self.position_history.clear()
+        self.version += 1
         self.logger.info("Position history cleared")
     
+    def get_version(self) -> int:
+        """Get the position data version, which changes whenever new data arrives"""
+        return self.version
+    
+    def _client_info(self):
+        """Get (client_type, endpoint) describing the active client"""
+        if self.demo_mode:
+            return "Demo Mode", "simulated"
+        if AWS_IOT_AVAILABLE and not isinstance(self.client, MockMQTTClient):
+            return 'AWS IoT', config.aws_iot.endpoint
+        return 'Mock', 'localhost'
+    
+    def snapshot(self) -> HandlerSnapshot:
+        """Get connection status and latest data in a single call"""
+        client_type, _ = self._client_info()
+        version = self.version
+        
+        return HandlerSnapshot(
+            connected=self.connected,
+            client_type=client_type,
+            latest_position=self.latest_position,
+            rssi_data=self._rssi_data_view(),
+            version=version
+        )
+    
+    def _rssi_data_view(self) -> Mapping:
+        """Get a read-only copy of the latest RSSI data, shared until the next reading arrives"""
+        view = self._rssi_view
+        if view is None:
+            view = self._rssi_view = MappingProxyType(dict(self.latest_rssi_data))
+        return view
+    
+    def _history_list(self) -> List[Dict]:
+        """Get position history as a list, copied only when it changed since the last call"""
+        version = self.version
+        if self._history_copy_version != version:
+            self._history_copy = list(self.position_history)
+            self._history_copy_version = version
+        return self._history_copy
+    
+    def _publish_snapshot(self):
+        """Publish a fresh snapshot for the dashboard, replacing any unread one"""
+        # maxlen=1 makes the append drop any snapshot the dashboard hasn't read yet
+        self.snapshot_queue.append(self.snapshot())
+    
+    def poll_snapshot(self) -> Optional[HandlerSnapshot]:
+        """Get the newest published snapshot without blocking (None if nothing new)"""
+        try:
+            return self.snapshot_queue.popleft()
+        except IndexError:
+            return None
+    
     def get_connection_status(self) -> Dict:
         """Get connection status information"""
-        if self.demo_mode:
-            client_type = "Demo Mode"
-            endpoint = "simulated"
-        else:
-            client_type = 'AWS IoT' if AWS_IOT_AVAILABLE and not isinstance(self.client, MockMQTTClient) else 'Mock'
-            endpoint = config.aws_iot.endpoint if AWS_IOT_AVAILABLE and not isinstance(self.client, MockMQTTClient) else 'localhost'
+        client_type, endpoint = self._client_info()
         
         return {
             'connected': self.connected,
             'client_type': client_type,
             'endpoint': endpoint,
-            'last_update': self.latest_position['timestamp'] if self.latest_position else None,
+            'last_update': format_timestamp(self.latest_position['timestamp']) if self.latest_position else None,
             'data_points': len(self.position_history)
         }
\ No newline at end of file
@@ -3,10 +3,130 @@ Trilateration algorithms for Project Victoria
 Calculates OBU position from RSSI measurements from multiple RSUs
 """
 import numpy as np
-from scipy.optimize import minimize
 from typing import Dict, Tuple, Optional, List
 import math
 
+from _jit import njit
+
+@njit(cache=True, fastmath=True)
+def _range_cost(x, y, rsu_xy, dists):
+    """Sum of squared range errors |(x, y) - rsu_i| - d_i"""
+    cost = 0.0
+    for i in range(rsu_xy.shape[0]):
+        dx = x - rsu_xy[i, 0]
+        dy = y - rsu_xy[i, 1]
+        e = math.sqrt(dx * dx + dy * dy) - dists[i]
+        cost += e * e
+    return cost
+
+@njit(cache=True, fastmath=True)
+def _gauss_newton_trilat(x, y, rsu_xy, dists, max_iter, tol):
+    """
+    Damped Gauss-Newton (Levenberg-Marquardt) on the range residuals
+    
+    Stops when a step is shorter than tol, no step lowers the cost, or after
+    max_iter iterations, and returns (x, y, sum of squared residuals)
+    """
+    n = rsu_xy.shape[0]
+    tol_sq = tol * tol
+    cost = _range_cost(x, y, rsu_xy, dists)
+    damping = 1e-3
+    for _ in range(max_iter):
+        # J^T J and J^T r; Jacobian rows are unit vectors from each RSU towards (x, y)
+        a = 0.0
+        b = 0.0
+        c = 0.0
+        gx = 0.0
+        gy = 0.0
+        for i in range(n):
+            dx = x - rsu_xy[i, 0]
+            dy = y - rsu_xy[i, 1]
+            r = math.sqrt(dx * dx + dy * dy)
+            if r > 1e-12:
+                ux = dx / r
+                uy = dy / r
+                e = r - dists[i]
+                a += ux * ux
+                b += ux * uy
+                c += uy * uy
+                gx += ux * e
+                gy += uy * e
+        
+        # Raise the damping until the 2x2 step lowers the cost
+        accepted = False
+        while damping < 1e10:
+            a_d = a + damping
+            c_d = c + damping
+            det = a_d * c_d - b * b
+            if det > 1e-12:
+                step_x = -(c_d * gx - b * gy) / det
+                step_y = -(a_d * gy - b * gx) / det
+                trial_cost = _range_cost(x + step_x, y + step_y, rsu_xy, dists)
+                if trial_cost <= cost:
+                    accepted = True
+                    break
+            damping *= 10.0
+        if not accepted:
+            # No descent step left: (x, y) is a minimum up to numerical precision
+            break
+        
+        x += step_x
+        y += step_y
+        cost = trial_cost
+        damping = max(damping * 0.1, 1e-9)
+        if step_x * step_x + step_y * step_y < tol_sq:
+            break
+    return x, y, cost
+
+@njit(cache=True)
+def _kalman_filter_batch(xs, ys, ts, px, py, vx, vy, t, k_pos, k_vel):
+    """Run PositionFilter's predict/correct recursion over a sequence of fixes"""
+    n = xs.shape[0]
+    filtered = np.empty((n, 2))
+    for i in range(n):
+        dt = ts[i] - t
+        if dt > 0.0:
+            predicted_x = px + vx * dt
+            predicted_y = py + vy * dt
+            innov_x = xs[i] - predicted_x
+            innov_y = ys[i] - predicted_y
+            px = predicted_x + k_pos * innov_x
+            py = predicted_y + k_pos * innov_y
+            vx += k_vel * innov_x
+            vy += k_vel * innov_y
+            t = ts[i]
+        filtered[i, 0] = px
+        filtered[i, 1] = py
+    return filtered, px, py, vx, vy, t
+
+def _solve_2x2_least_squares(A: np.ndarray, b: np.ndarray) -> Optional[Tuple[float, float]]:
+    """
+    Solve a least squares problem with two unknowns in closed form
+    
+    Args:
+        A: Coefficient matrix of shape (m, 2), m >= 2
+        b: Right-hand side of shape (m,)
+        
+    Returns:
+        Solution (x, y) or None if the system is (near-)singular
+    """
+    if A.shape[0] == 2:
+        # Square system (3 RSUs): solve directly
+        m, v = A, b
+    else:
+        # Overdetermined: normal equations A^T A x = A^T b
+        m = A.T @ A
+        v = A.T @ b
+    
+    det = m[0, 0] * m[1, 1] - m[0, 1] * m[1, 0]
+    if abs(det) <= 1e-12:
+        return None
+    
+    return (
+        (m[1, 1] * v[0] - m[0, 1] * v[1]) / det,
+        (m[0, 0] * v[1] - m[1, 0] * v[0]) / det
+    )
+
 class RSSITrilaterationSolver:
     """
     Trilateration solver using RSSI measurements
@@ -15,10 +135,52 @@ class RSSITrilaterationSolver:
     def __init__(self):
         # RSSI to distance conversion parameters  
         # Using simplified log-distance path loss model: RSSI = A - 10*n*log10(d)
-        self.tx_power = 20  # dBm (Murata Type1YL DSRC mode typical power)
-        self.path_loss_exponent = 2.0  # Free space = 2, urban = 2.7-5
-        self.reference_distance = 1.0  # meters
+        self._tx_power = 20  # dBm (Murata Type1YL DSRC mode typical power)
+        self._path_loss_exponent = 2.0  # Free space = 2, urban = 2.7-5
+        self._reference_distance = 1.0  # meters
+        self._update_constants()
         
+        # Optimization only refines linear fixes whose range RMS residual exceeds this
+        self._refine_threshold = 1.0  # meters
+    
+    def _update_constants(self):
+        """Recompute the cached path loss constants after a parameter change"""
+        # d = d0 * 10^((Tx_Power - RSSI) / (10 * n)) = K * 10^(-RSSI / (10 * n))
+        self._inv_10n = 1.0 / (10.0 * self._path_loss_exponent)
+        self._inv_10n_log2 = self._inv_10n * math.log2(10.0)  # For np.exp2
+        self._inv_10n_ln10 = self._inv_10n * math.log(10.0)  # For math.exp
+        self._K = self._reference_distance * (10.0 ** (self._tx_power * self._inv_10n))
+    
+    @property
+    def tx_power(self) -> float:
+        """Transmit power in dBm"""
+        return self._tx_power
+    
+    @tx_power.setter
+    def tx_power(self, value: float):
+        self._tx_power = value
+        self._update_constants()
+    
+    @property
+    def path_loss_exponent(self) -> float:
+        """Path loss exponent n"""
+        return self._path_loss_exponent
+    
+    @path_loss_exponent.setter
+    def path_loss_exponent(self, value: float):
+        self._path_loss_exponent = value
+        self._update_constants()
+    
+    @property
+    def reference_distance(self) -> float:
+        """Reference distance d0 in meters"""
+        return self._reference_distance
+    
+    @reference_distance.setter
+    def reference_distance(self, value: float):
+        self._reference_distance = value
+        self._update_constants()
+    
     def rssi_to_distance(self, rssi: float) -> float:
         """
         Convert RSSI to distance using log-distance path loss model
@@ -29,19 +191,50 @@ class RSSITrilaterationSolver:
         Returns:
             Distance in meters
         """
-        if rssi >= self.tx_power:
-            return self.reference_distance
+        if rssi >= self._tx_power:
+            return self._reference_distance
         
         # RSSI = Tx_Power - 10 * n * log10(d/d0)
-        # d = d0 * 10^((Tx_Power - RSSI) / (10 * n))
-        distance = self.reference_distance * (10 ** ((self.tx_power - rssi) / (10 * self.path_loss_exponent)))
-        
-        # Debug logging
-        print(f"DEBUG: RSSI {rssi} dBm → Distance {distance:.2f} m")
+        # d = d0 * 10^((Tx_Power - RSSI) / (10 * n)), with the constant part cached
+        distance = self._K * math.exp(-rssi * self._inv_10n_ln10)
         
         # Clamp to reasonable values
         return max(0.1, min(distance, 1000.0))
     
+    def rssi_to_distance_array(self, rssi: np.ndarray) -> np.ndarray:
+        """
+        Convert an array of RSSI values to distances in one vectorized pass
+        
+        Args:
+            rssi: RSSI values in dBm
+            
+        Returns:
+            Distances in meters, same rules as rssi_to_distance
+        """
+        distance = self._K * np.exp2(rssi * -self._inv_10n_log2)
+        np.clip(distance, 0.1, 1000.0, out=distance)
+        return np.where(rssi >= self._tx_power, self._reference_distance, distance)
+    
+    def _measurement_arrays(self,
+                            rsu_positions: Dict[str, Tuple[float, float]],
+                            rssi_measurements: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Collect coordinates and distances of the RSUs with a known position
+        
+        Args:
+            rsu_positions: Dictionary mapping RSU ID to (x, y) coordinates
+            rssi_measurements: Dictionary mapping RSU ID to RSSI value
+            
+        Returns:
+            Tuple of (rsu_coords of shape (n, 2), distances of shape (n,))
+        """
+        rsu_ids = [rsu_id for rsu_id in rssi_measurements if rsu_id in rsu_positions]
+        rssi = np.fromiter(
+            (rssi_measurements[rsu_id] for rsu_id in rsu_ids), dtype=np.float64, count=len(rsu_ids)
+        )
+        rsu_coords = np.array([rsu_positions[rsu_id] for rsu_id in rsu_ids], dtype=np.float64).reshape(-1, 2)
+        return rsu_coords, self.rssi_to_distance_array(rssi)
+    
     def calculate_position_least_squares(self, 
                                        rsu_positions: Dict[str, Tuple[float, float]], 
                                        rssi_measurements: Dict[str, float]) -> Optional[Tuple[float, float, float]]:
@@ -59,88 +252,60 @@ class RSSITrilaterationSolver:
             return None
         
         # Convert RSSI to distances
-        distances = {}
-        rsu_coords = []
-        dist_values = []
-        
-        print(f"\nDEBUG: Starting trilateration")
-        print(f"RSU positions: {rsu_positions}")
-        print(f"RSSI measurements: {rssi_measurements}")
-        
-        for rsu_id, rssi in rssi_measurements.items():
-            if rsu_id in rsu_positions:
-                distance = self.rssi_to_distance(rssi)
-                distances[rsu_id] = distance
-                rsu_coords.append(rsu_positions[rsu_id])
-                dist_values.append(distance)
-                print(f"DEBUG: {rsu_id} at {rsu_positions[rsu_id]} → distance {distance:.2f}m")
+        rsu_coords, dist_values = self._measurement_arrays(rsu_positions, rssi_measurements)
+        
+        return self._least_squares_arrays(rsu_coords, dist_values)
+    
+    def _least_squares_arrays(self,
+                              rsu_coords: np.ndarray,
+                              dist_values: np.ndarray) -> Optional[Tuple[float, float, float]]:
+        """
+        Least squares trilateration on array inputs
         
+        Args:
+            rsu_coords: RSU coordinates of shape (n, 2)
+            dist_values: Measured distances of shape (n,)
+            
+        Returns:
+            Tuple of (x, y, accuracy_estimate) or None if calculation fails
+        """
         if len(rsu_coords) < 3:
-            print(f"DEBUG: Not enough RSUs ({len(rsu_coords)})")
             return None
         
-        rsu_coords = np.array(rsu_coords)
-        dist_values = np.array(dist_values)
-        
-        # Use first RSU as reference point
-        ref_point = rsu_coords[0]
-        
         # Use a more stable trilateration approach
         # Convert to relative coordinates to avoid large numbers
         x1, y1 = rsu_coords[0]
         r1 = dist_values[0]
         
         # Translate all coordinates relative to first RSU
-        A = []
-        b = []
+        rel = rsu_coords[1:] - rsu_coords[0]
         
-        for i in range(1, len(rsu_coords)):
-            xi, yi = rsu_coords[i]
-            ri = dist_values[i]
-            
-            # Relative coordinates
-            dx = xi - x1
-            dy = yi - y1
-            
-            # Linearized equation: 2*dx*x + 2*dy*y = dx² + dy² + r1² - ri²
-            A.append([2 * dx, 2 * dy])
-            b.append(dx**2 + dy**2 + r1**2 - ri**2)
-            
-            print(f"DEBUG: Equation {i}: 2*{dx}*x + 2*{dy}*y = {dx**2 + dy**2 + r1**2 - ri**2}")
-        
-        A = np.array(A)
-        b = np.array(b)
-        
-        print(f"DEBUG: Matrix A = \n{A}")
-        print(f"DEBUG: Vector b = {b}")
+        # Linearized equations: 2*dx*x + 2*dy*y = dx² + dy² + r1² - ri²
+        A = 2.0 * rel
+        b = np.einsum('ij,ij->i', rel, rel) + (r1 * r1 - dist_values[1:] ** 2)
         
         try:
-            # Solve least squares problem
-            position_rel, residuals, rank, s = np.linalg.lstsq(A, b, rcond=None)
+            # Two unknowns: solve in closed form, LAPACK only for (near-)singular geometry
+            position_rel = _solve_2x2_least_squares(A, b)
+            if position_rel is None:
+                # QR-based gelsy; A and b are scratch arrays
+                from scipy.linalg import lstsq
+                position_rel, residuals, rank, s = lstsq(
+                    A, b, lapack_driver='gelsy', check_finite=False,
+                    overwrite_a=True, overwrite_b=True
+                )
             
             if len(position_rel) != 2:
-                print(f"DEBUG: Least squares failed - wrong dimensions")
                 return None
                 
             # Convert back to absolute coordinates
             x = position_rel[0] + x1
             y = position_rel[1] + y1
             
-            print(f"DEBUG: Relative solution: ({position_rel[0]:.2f}, {position_rel[1]:.2f})")
-            print(f"DEBUG: Absolute position: ({x:.2f}, {y:.2f})")
+            # Calculate accuracy estimate from range residuals
+            residuals = np.hypot(x - rsu_coords[:, 0], y - rsu_coords[:, 1]) - dist_values
+            accuracy = math.sqrt(float(np.dot(residuals, residuals)) / len(rsu_coords))
             
-            # Calculate accuracy estimate from residuals
-            if len(residuals) > 0:
-                accuracy = np.sqrt(residuals[0] / len(rsu_coords))
-            else:
-                # Calculate residuals manually if not returned
-                predicted_distances = [np.sqrt((x - rsu_coords[i][0])**2 + (y - rsu_coords[i][1])**2) 
-                                     for i in range(len(rsu_coords))]
-                residual_sum = sum((predicted_distances[i] - dist_values[i])**2 
-                                 for i in range(len(rsu_coords)))
-                accuracy = np.sqrt(residual_sum / len(rsu_coords))
-            
-            print(f"DEBUG: Final result: ({x:.2f}, {y:.2f}) ±{accuracy:.2f}m")
             return (float(x), float(y), float(accuracy))
             
         except np.linalg.LinAlgError:
@@ -165,38 +330,52 @@ class RSSITrilaterationSolver:
             return None
         
         # Convert RSSI to distances
-        valid_data = []
-        for rsu_id, rssi in rssi_measurements.items():
-            if rsu_id in rsu_positions:
-                distance = self.rssi_to_distance(rssi)
-                valid_data.append((rsu_positions[rsu_id], distance))
+        rsu_coords, dist_values = self._measurement_arrays(rsu_positions, rssi_measurements)
         
-        if len(valid_data) < 3:
+        return self._optimization_arrays(rsu_coords, dist_values, initial_guess)
+    
+    def _optimization_arrays(self,
+                             rsu_coords: np.ndarray,
+                             dist_values: np.ndarray,
+                             initial_guess: Tuple[float, float] = None) -> Optional[Tuple[float, float, float]]:
+        """
+        Optimization-based positioning on array inputs
+        
+        Args:
+            rsu_coords: RSU coordinates of shape (n, 2)
+            dist_values: Measured distances of shape (n,)
+            initial_guess: Initial position guess (x, y)
+            
+        Returns:
+            Tuple of (x, y, accuracy_estimate) or None if calculation fails
+        """
+        if len(rsu_coords) < 3:
             return None
         
-        # Initial guess (center of RSU positions if not provided)
         if initial_guess is None:
-            rsu_coords = [pos for pos, _ in valid_data]
-            initial_guess = (
-                sum(pos[0] for pos in rsu_coords) / len(rsu_coords),
-                sum(pos[1] for pos in rsu_coords) / len(rsu_coords)
-            )
-        
-        def objective_function(pos):
-            """Objective function to minimize"""
-            x, y = pos
-            error = 0
-            for (rsu_x, rsu_y), measured_dist in valid_data:
-                calculated_dist = math.sqrt((x - rsu_x)**2 + (y - rsu_y)**2)
-                error += (calculated_dist - measured_dist)**2
-            return error
+            # Closed-form linear fix: good enough as is when the ranges agree,
+            # otherwise a warm start for the non-linear refinement
+            linear = self._least_squares_arrays(rsu_coords, dist_values)
+            if linear is not None:
+                if linear[2] <= self._refine_threshold:
+                    return linear
+                initial_guess = linear[:2]
+        
+        # Initial guess (center of RSU positions if no linear fix either)
+        if initial_guess is None:
+            initial_guess = rsu_coords.mean(axis=0)
         
         try:
-            result = minimize(objective_function, initial_guess, method='BFGS')
+            # Damped Gauss-Newton on the range residuals with the analytic Jacobian
+            x, y, cost = _gauss_newton_trilat(
+                float(initial_guess[0]), float(initial_guess[1]),
+                np.ascontiguousarray(rsu_coords, dtype=np.float64),
+                np.ascontiguousarray(dist_values, dtype=np.float64),
+                50, 1e-4
+            )
             
-            if result.success:
-                x, y = result.x
-                accuracy = math.sqrt(result.fun / len(valid_data))
+            if math.isfinite(cost):
+                accuracy = math.sqrt(cost / len(rsu_coords))
                 return (float(x), float(y), float(accuracy))
             else:
                 return None
@@ -225,56 +404,146 @@ class RSSITrilaterationSolver:
             return self.calculate_position_optimization(rsu_positions, rssi_measurements)
         else:
             raise ValueError(f"Unknown method: {method}")
+    
+    def calculate_position_arrays(self,
+                                  rsu_coords: np.ndarray,
+                                  rssi: np.ndarray,
+                                  method: str = 'least_squares') -> Optional[Tuple[float, float, float]]:
+        """
+        Calculate OBU position from RSU coordinates and RSSI values as arrays
+        
+        Args:
+            rsu_coords: RSU coordinates of shape (n, 2)
+            rssi: RSSI values in dBm of shape (n,), aligned with rsu_coords
+            method: 'least_squares' or 'optimization'
+            
+        Returns:
+            Tuple of (x, y, accuracy_estimate) or None if calculation fails
+        """
+        dist_values = self.rssi_to_distance_array(rssi)
+        if method == 'least_squares':
+            return self._least_squares_arrays(rsu_coords, dist_values)
+        elif method == 'optimization':
+            return self._optimization_arrays(rsu_coords, dist_values)
+        else:
+            raise ValueError(f"Unknown method: {method}")
 
 class PositionFilter:
     """
-    Simple Kalman-like filter for position smoothing
+    Steady-state Kalman filter for position smoothing
+    
+    Each axis is tracked independently with a constant-velocity model
+    (state [position, velocity]). The steady-state gain for the nominal
+    update interval is solved once up front, so each update is a handful
+    of scalar multiply-adds.
     """
     
-    def __init__(self, process_noise: float = 0.1, measurement_noise: float = 1.0):
+    def __init__(self, process_noise: float = 0.1, measurement_noise: float = 1.0,
+                 nominal_dt: float = 0.1):
         self.process_noise = process_noise
         self.measurement_noise = measurement_noise
-        self.last_position = None
-        self.last_velocity = (0.0, 0.0)
-        self.last_timestamp = None
+        self.nominal_dt = nominal_dt
+        self._k_pos, self._k_vel = self._steady_state_gain(process_noise, measurement_noise, nominal_dt)
+        # State kept as plain floats to avoid per-update tuple churn
+        self._px = 0.0
+        self._py = 0.0
+        self._vx = 0.0
+        self._vy = 0.0
+        self._t = None
     
-    def update(self, new_position: Tuple[float, float], timestamp: float) -> Tuple[float, float]:
+    @staticmethod
+    def _steady_state_gain(q: float, r: float, dt: float) -> Tuple[float, float]:
+        """
+        Solve the steady-state Kalman gain for a 1D constant-velocity model
+        
+        Args:
+            q: Process noise spectral density (white acceleration)
+            r: Measurement noise variance
+            dt: Nominal time between measurements
+            
+        Returns:
+            Gain (K_position, K_velocity)
+        """
+        from scipy.linalg import solve_discrete_are
+        
+        F = np.array([[1.0, dt], [0.0, 1.0]])
+        H = np.array([[1.0, 0.0]])
+        Q = q * np.array([[dt ** 3 / 3.0, dt ** 2 / 2.0],
+                          [dt ** 2 / 2.0, dt]])
+        R = np.array([[r]])
+        
+        # Predicted covariance P satisfies the DARE for the dual system (F^T, H^T)
+        P = solve_discrete_are(F.T, H.T, Q, R)
+        K = P @ H.T / (H @ P @ H.T + R)
+        return float(K[0, 0]), float(K[1, 0])
+    
+    def update(self, x: float, y: float, timestamp: float) -> Tuple[float, float]:
         """
         Update filter with new position measurement
         
         Args:
-            new_position: New measured position (x, y)
+            x: Measured X coordinate
+            y: Measured Y coordinate
             timestamp: Timestamp of measurement
             
         Returns:
             Filtered position (x, y)
         """
-        if self.last_position is None:
-            self.last_position = new_position
-            self.last_timestamp = timestamp
-            return new_position
+        if self._t is None:
+            self._px, self._py, self._t = x, y, timestamp
+            return (x, y)
         
-        dt = timestamp - self.last_timestamp
+        dt = timestamp - self._t
         if dt <= 0:
-            return self.last_position
+            return (self._px, self._py)
         
-        # Predict position based on last velocity
-        predicted_x = self.last_position[0] + self.last_velocity[0] * dt
-        predicted_y = self.last_position[1] + self.last_velocity[1] * dt
+        k_pos = self._k_pos
+        k_vel = self._k_vel
         
-        # Simple weighted average (simplified Kalman filter)
-        gain = self.process_noise / (self.process_noise + self.measurement_noise)
+        # Predict with the constant-velocity model
+        predicted_x = self._px + self._vx * dt
+        predicted_y = self._py + self._vy * dt
         
-        filtered_x = predicted_x + gain * (new_position[0] - predicted_x)
-        filtered_y = predicted_y + gain * (new_position[1] - predicted_y)
+        # Correct with the precomputed steady-state gain
+        innov_x = x - predicted_x
+        innov_y = y - predicted_y
+        filtered_x = predicted_x + k_pos * innov_x
+        filtered_y = predicted_y + k_pos * innov_y
+        self._vx += k_vel * innov_x
+        self._vy += k_vel * innov_y
         
-        # Update velocity estimate
-        self.last_velocity = (
-            (filtered_x - self.last_position[0]) / dt,
-            (filtered_y - self.last_position[1]) / dt
-        )
+        self._px = filtered_x
+        self._py = filtered_y
+        self._t = timestamp
+        
+        return (filtered_x, filtered_y)
+    
+    def batch_update(self, positions: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Update filter with a sequence of position measurements
         
-        self.last_position = (filtered_x, filtered_y)
-        self.last_timestamp = timestamp
+        Equivalent to calling update() for each fix in order, e.g. when
+        replaying recorded data.
         
-        return self.last_position
\ No newline at end of file
+        Args:
+            positions: Measured positions of shape (n, 2)
+            timestamps: Timestamps of shape (n,)
+            
+        Returns:
+            Filtered positions of shape (n, 2)
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        timestamps = np.ascontiguousarray(timestamps, dtype=np.float64)
+        if not len(timestamps):
+            return np.empty((0, 2))
+        
+        if self._t is None:
+            # The first fix initializes the state and passes through unchanged
+            self._px, self._py = positions[0].tolist()
+            self._t = float(timestamps[0])
+        
+        filtered, self._px, self._py, self._vx, self._vy, self._t = _kalman_filter_batch(
+            np.ascontiguousarray(positions[:, 0]), np.ascontiguousarray(positions[:, 1]), timestamps,
+            self._px, self._py, self._vx, self._vy, self._t, self._k_pos, self._k_vel
+        )
+        return filtered
@@ -5,7 +5,9 @@ Collects RSSI measurements from RSU socket connection for field testing
 Modified to append to existing rssi_field_test.csv or create if not exists
 """
 
+import asyncio
 import json
+import logging
 import socket
 import threading
 import time
@@ -14,12 +16,37 @@ import sys
 import csv
 import argparse
 import os
-from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Configuration
 SOCKET_PORT = 9999
 CSV_FILENAME = "rssi_field_test.csv"
+CSV_FLUSH_EVERY = 64  # Rows written between explicit flushes
+CSV_BUFFER_SIZE = 1 << 16
+PROGRESS_EVERY = 100  # Samples between progress lines; per-sample lines are DEBUG
+SOCKET_RCVBUF = 4 * 1024 * 1024  # Kernel receive buffer per RSU connection
+SOCKET_READ_BUFFER = 1 << 16
+
+
+_now_cache = (0, "")  # (whole second, formatted date and time) reused by _fast_now
+
+
+def _fast_now() -> str:
+    """Current UTC time in ISO 8601, formatting the date part only once per second"""
+    global _now_cache
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _now_cache
+    if second != cached_second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        _now_cache = (second, prefix)
+    return f"{prefix}.{int((now - second) * 1e6):06d}+00:00"
 
 
 class FieldTestCollector:
@@ -30,9 +57,16 @@ class FieldTestCollector:
         self.max_samples = max_samples
         self.sample_count = 0
         self.socket_server = None
+        self._serve_thread = None
+        self._serve_loop = None
+        self._serve_task = None
+        self._rsu_writers = set()  # Open RSU connections, closed by stop()
         self.running = False
+        self.stopping = False
         self.csv_file = None
-        self.csv_writer = None
+        self._row_tail = f",{self.distance}\r\n"  # Constant distance column and csv line ending
+        self._since_flush = 0
+        self._setup_logging()
 
         # Setup signal handlers for proper cleanup
         signal.signal(signal.SIGINT, self.shutdown)
@@ -48,6 +82,17 @@ class FieldTestCollector:
         else:
             print("Running continuously until Ctrl+C")
 
+    def _setup_logging(self):
+        """Setup logging for the collector"""
+        self.logger = logging.getLogger('FieldTestCollector')
+        self.logger.setLevel(logging.INFO)
+
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
     def init_csv_file(self):
         """Initialize CSV file with headers or append to existing file"""
         file_exists = os.path.exists(CSV_FILENAME)
@@ -55,8 +100,7 @@ class FieldTestCollector:
         try:
             if file_exists:
                 # File exists, open in append mode
-                self.csv_file = open(CSV_FILENAME, 'a', newline='')
-                self.csv_writer = csv.writer(self.csv_file)
+                self.csv_file = open(CSV_FILENAME, 'ab', buffering=CSV_BUFFER_SIZE)
                 print(f"Appending to existing CSV file: {CSV_FILENAME}")
                 
                 # Count existing rows to continue sample numbering
@@ -68,11 +112,10 @@ class FieldTestCollector:
                     print(f"Found {existing_rows} existing samples in CSV file")
             else:
                 # File doesn't exist, create new file with headers
-                self.csv_file = open(CSV_FILENAME, 'w', newline='')
-                self.csv_writer = csv.writer(self.csv_file)
+                self.csv_file = open(CSV_FILENAME, 'wb', buffering=CSV_BUFFER_SIZE)
                 
                 # Write header
-                self.csv_writer.writerow(['timestamp', 'rssi_dbm', 'distance_m'])
+                self.csv_file.write(b'timestamp,rssi_dbm,distance_m\r\n')
                 self.csv_file.flush()
                 print(f"Created new CSV file: {CSV_FILENAME}")
 
@@ -80,80 +123,122 @@ class FieldTestCollector:
             print(f"Failed to initialize CSV file: {e}")
             sys.exit(1)
 
+    def flush_csv(self):
+        """Flush buffered CSV rows to disk"""
+        if self.csv_file and not self.csv_file.closed and self._since_flush:
+            self._since_flush = 0
+            self.csv_file.flush()
+
     def start_socket_server(self):
         """Start socket server for RSU connections"""
         try:
             self.socket_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # Set before listen() so accepted sockets inherit it and the TCP window
+            # scale is negotiated for it; the kernel caps it at net.core.rmem_max
+            # (raise with: sysctl -w net.core.rmem_max=4194304)
+            self.socket_server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF)
             self.socket_server.bind(("localhost", SOCKET_PORT))
             self.socket_server.listen(5)
 
             print(f"Socket server listening on port {SOCKET_PORT}")
 
-            # Accept connections in background
-            threading.Thread(target=self.accept_connections, daemon=True).start()
+            # Serve every RSU connection from one event loop thread
+            self._serve_thread = threading.Thread(target=self.serve_connections, daemon=True)
+            self._serve_thread.start()
             return True
 
         except Exception as e:
             print(f"Failed to start socket server: {e}")
             return False
 
-    def accept_connections(self):
-        """Accept RSU connections"""
-        while self.running:
-            try:
-                client_socket, address = self.socket_server.accept()
-                print(f"RSU connected from {address}")
-                threading.Thread(
-                    target=self.handle_rsu,
-                    args=(client_socket, address),
-                    daemon=True
-                ).start()
-            except Exception as e:
-                if self.running:
-                    print(f"Error accepting connection: {e}")
-                break
-
-    def handle_rsu(self, client_socket, address):
+    def serve_connections(self):
+        """Run the event loop that accepts and reads all RSU connections"""
+        try:
+            asyncio.run(self._serve_forever())
+        except Exception as e:
+            if self.running:
+                print(f"Error accepting connection: {e}")
+
+    async def _serve_forever(self):
+        """Serve RSU connections until stop() cancels this task"""
+        self._serve_loop = asyncio.get_running_loop()
+        self._serve_task = asyncio.current_task()
+        server = await asyncio.start_server(
+            self.handle_rsu, sock=self.socket_server, limit=SOCKET_READ_BUFFER
+        )
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+    async def handle_rsu(self, reader, writer):
         """Handle individual RSU connection"""
+        address = writer.get_extra_info('peername')
+        print(f"RSU connected from {address}")
+        self._rsu_writers.add(writer)
         try:
+            # Newline-delimited JSON (see README): one message per line; the stream
+            # reader reassembles messages split across reads and splits coalesced
+            # ones. An unterminated last message is still returned at EOF
             while self.running:
-                data = client_socket.recv(4096)
-                if not data:
+                line = await reader.readline()
+                if not line:
                     break
+                if not line.isspace():
+                    self.process_rssi_data(line)
 
-                self.process_rssi_data(data.decode('utf-8'))
-
+        except asyncio.CancelledError:
+            pass  # Server shutting down
         except Exception as e:
             print(f"Error with RSU {address}: {e}")
         finally:
-            client_socket.close()
+            self._rsu_writers.discard(writer)
+            writer.close()
             print(f"RSU {address} disconnected")
 
-    def process_rssi_data(self, data):
+    def _stop_serving(self):
+        """Close the RSU connections and the server (runs on the event loop thread)"""
+        for writer in list(self._rsu_writers):
+            writer.close()  # Ends the handler's readline with EOF
+        self._serve_task.cancel()
+
+    def process_rssi_data(self, data: bytes):
         """Process RSSI data from RSU and save to CSV"""
         try:
-            rsu_data = json.loads(data.strip())
+            # Both parsers take the raw line bytes and skip surrounding whitespace
+            if ORJSON_AVAILABLE:
+                rsu_data = orjson.loads(data)
+            else:
+                rsu_data = json.loads(data)
 
             # Extract RSSI and timestamp
             rssi_value = float(rsu_data.get("rssi", 0))
-            timestamp = rsu_data.get("timestamp", datetime.now(timezone.utc).isoformat())
-
-            # Write to CSV
-            self.csv_writer.writerow([
-                timestamp,
-                rssi_value,
-                self.distance
-            ])
-            self.csv_file.flush()
+            timestamp = rsu_data.get("timestamp")
+            if timestamp is None:
+                timestamp = _fast_now()
+
+            # Write to CSV; only an unusual RSU timestamp needs csv quoting
+            if isinstance(timestamp, str) and any(c in timestamp for c in ',"\r\n'):
+                timestamp = '"' + timestamp.replace('"', '""') + '"'
+            self.csv_file.write(f"{timestamp},{rssi_value}{self._row_tail}".encode('utf-8'))
+
+            # Flush in batches; run() also flushes leftovers once per second
+            self._since_flush += 1
+            if self._since_flush >= CSV_FLUSH_EVERY:
+                self.flush_csv()
 
             self.sample_count += 1
-            print(f"Sample {self.sample_count}: RSSI {rssi_value} dBm at {self.distance}m")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Sample {self.sample_count}: RSSI {rssi_value} dBm at {self.distance}m")
+            elif self.sample_count % PROGRESS_EVERY == 0:
+                self.logger.info(f"Collected {self.sample_count} samples (last RSSI {rssi_value} dBm)")
 
             # Check if we've reached max samples
             if self.max_samples and self.sample_count >= self.max_samples:
                 print(f"Reached maximum samples ({self.max_samples}). Stopping...")
-                self.stop()
+                self.running = False  # run() stops the collector from the main thread
 
         except json.JSONDecodeError as e:
             print(f"Failed to parse JSON data: {e}")
@@ -176,17 +261,26 @@ class FieldTestCollector:
 
     def stop(self):
         """Stop the collector"""
+        if self.stopping:
+            return
+        self.stopping = True
         print("Stopping Field Test Collector...")
 
         self.running = False
 
-        # Close socket
-        if self.socket_server:
+        # Close socket; with the event loop running, close the RSU connections there too
+        if self._serve_loop is not None:
+            self._serve_loop.call_soon_threadsafe(self._stop_serving)
+            self._serve_loop = None
+            # Wait for the loop to stop so no row is written after the CSV is closed
+            self._serve_thread.join(timeout=5)
+            print("Socket server closed")
+        elif self.socket_server:
             self.socket_server.close()
             print("Socket server closed")
 
-        # Close CSV file
-        if self.csv_file:
+        # Close CSV file, writing out any rows still buffered
+        if self.csv_file and not self.csv_file.closed:
             self.csv_file.close()
             print(f"CSV file saved with {self.sample_count} samples added this session")
 
@@ -208,6 +302,7 @@ class FieldTestCollector:
             print("Collector running... Press Ctrl+C to stop")
             while self.running:
                 time.sleep(1)
+                self.flush_csv()
         except KeyboardInterrupt:
             print("\nInterrupted by user")
         finally:
@@ -3,29 +3,102 @@ Project Victoria MQTT5 Gateway - Simplified Version
 RSU to AWS IoT Cloud Communication Gateway
 """
 
+import asyncio
 import json
+import logging
 import socket
+import struct
 import threading
 import time
 import signal
 import sys
+import zlib
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 
 from awsiot import mqtt5_client_builder
 from awscrt import mqtt5
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
-@dataclass
+# RSU connection tuning
+SOCKET_RCVBUF = 4 * 1024 * 1024  # Kernel receive buffer per RSU connection
+SOCKET_READ_BUFFER = 1 << 16
+PROGRESS_EVERY = 100  # Samples between progress lines; per-sample lines are DEBUG
+
+
+_now_cache = (0, "")  # (whole second, formatted date and time) reused by _fast_now
+
+
+def _fast_now() -> str:
+    """Current UTC time in ISO 8601, formatting the date part only once per second"""
+    global _now_cache
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _now_cache
+    if second != cached_second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        _now_cache = (second, prefix)
+    return f"{prefix}.{int((now - second) * 1e6):06d}+00:00"
+
+
+# Binary payload record (little endian): int64 epoch us, uint32 rsu_id CRC32, uint32 obu_id CRC32, float32 RSSI
+_BINARY_RECORD = struct.Struct('<qIIf')
+
+
+def _epoch_seconds(timestamp) -> float:
+    """Epoch seconds of an RSU timestamp; naive ISO 8601 strings are taken as UTC"""
+    if not isinstance(timestamp, str):
+        return float(timestamp)
+    parsed = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+@lru_cache(maxsize=1024)
+def _id32(identifier: str) -> int:
+    """Stable 32-bit ID for the binary payload (CRC32 of the UTF-8 string)"""
+    return zlib.crc32(str(identifier).encode('utf-8'))
+
+
+@dataclass(frozen=True)
 class RSIMessage:
     """RSSI measurement data structure"""
+    # Declared by hand: dataclass(slots=True) needs Python 3.10
+    __slots__ = ("timestamp", "rsu_id", "obu_id", "rssi_value")
+
     timestamp: str
     rsu_id: str
     obu_id: str
     rssi_value: float
 
+    def pack(self) -> bytes:
+        """Fixed-layout binary record: epoch microseconds, RSU/OBU ID hashes, RSSI"""
+        try:
+            timestamp = _epoch_seconds(self.timestamp)
+        except (TypeError, ValueError):
+            timestamp = time.time()  # Unparseable RSU timestamp: use the receive time
+        return _BINARY_RECORD.pack(
+            int(timestamp * 1e6), _id32(self.rsu_id), _id32(self.obu_id), self.rssi_value
+        )
+
+    def as_dict(self) -> Dict:
+        """Shallow dict of the fields, for the stdlib json fallback"""
+        return {
+            "timestamp": self.timestamp,
+            "rsu_id": self.rsu_id,
+            "obu_id": self.obu_id,
+            "rssi_value": self.rssi_value
+        }
+
 
 class ConfigManager:
     """Simple configuration file manager"""
@@ -55,10 +128,31 @@ class VictoriaGateway:
 
     def __init__(self, config_path: str = "config.json"):
         self.config = ConfigManager(config_path).config
+        self._topic = self.config["topic"]
         self.mqtt_client = None
+
+        # Optional publish batching ("mqtt": {"batch": {"size": N, "interval": s}})
+        batch_config = self.config.get("mqtt", {}).get("batch", {})
+        self._batch_size = int(batch_config.get("size", 1))
+        self._batch_interval = float(batch_config.get("interval", 0.5))
+        self._batch_topic = batch_config.get("topic", f"{self._topic}/batch")
+        self._pub_buf = []
+        self._pub_lock = threading.Lock()
+
+        # "mqtt": {"payload_format": "binary"} publishes packed records instead of
+        # JSON; subscribers must decode _BINARY_RECORD
+        self._binary_payload = self.config.get("mqtt", {}).get("payload_format", "json") == "binary"
         self.socket_server = None
+        self._serve_thread = None
+        self._serve_loop = None
+        self._serve_task = None
+        self._flush_task = None
+        self._rsu_writers = set()  # Open RSU connections, closed by stop()
         self.running = False
+        self.stopping = False
         self.connected = False
+        self.sent_count = 0
+        self._setup_logging()
 
         # Setup signal handlers
         signal.signal(signal.SIGINT, self.shutdown)
@@ -66,6 +160,17 @@ class VictoriaGateway:
 
         print("Victoria Gateway initialized")
 
+    def _setup_logging(self):
+        """Setup logging for the gateway"""
+        self.logger = logging.getLogger('VictoriaGateway')
+        self.logger.setLevel(logging.INFO)
+
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
     def create_mqtt_client(self):
         """Create MQTT5 client"""
         aws_config = self.config["aws_iot"]
@@ -102,59 +207,99 @@ class VictoriaGateway:
         try:
             self.socket_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # Set before listen() so accepted sockets inherit it and the TCP window
+            # scale is negotiated for it; the kernel caps it at net.core.rmem_max
+            # (raise with: sysctl -w net.core.rmem_max=4194304)
+            self.socket_server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF)
             self.socket_server.bind(("localhost", port))
             self.socket_server.listen(5)
 
             print(f"Socket server listening on port {port}")
 
-            # Accept connections in background
-            threading.Thread(target=self.accept_connections, daemon=True).start()
+            # Serve every RSU connection from one event loop thread
+            self._serve_thread = threading.Thread(target=self.serve_connections, daemon=True)
+            self._serve_thread.start()
             return True
 
         except Exception as e:
             print(f"Failed to start socket server: {e}")
             return False
 
-    def accept_connections(self):
-        """Accept RSU connections"""
-        while self.running:
-            try:
-                client_socket, address = self.socket_server.accept()
-                print(f"RSU connected from {address}")
-                threading.Thread(
-                    target=self.handle_rsu,
-                    args=(client_socket, address),
-                    daemon=True
-                ).start()
-            except Exception as e:
-                if self.running:
-                    print(f"Error accepting connection: {e}")
-                break
+    def serve_connections(self):
+        """Run the event loop that accepts and reads all RSU connections"""
+        try:
+            asyncio.run(self._serve_forever())
+        except Exception as e:
+            if self.running:
+                print(f"Error accepting connection: {e}")
+
+    async def _serve_forever(self):
+        """Serve RSU connections until stop() cancels this task"""
+        self._serve_loop = asyncio.get_running_loop()
+        self._serve_task = asyncio.current_task()
+        server = await asyncio.start_server(
+            self.handle_rsu, sock=self.socket_server, limit=SOCKET_READ_BUFFER
+        )
+        if self._batch_size > 1:
+            # Keep a reference: the event loop only holds tasks weakly
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+                self._flush_task = None
 
-    def handle_rsu(self, client_socket, address):
+    async def handle_rsu(self, reader, writer):
         """Handle individual RSU connection"""
+        address = writer.get_extra_info('peername')
+        print(f"RSU connected from {address}")
+        self._rsu_writers.add(writer)
         try:
+            # Newline-delimited JSON (see README): one message per line; the stream
+            # reader reassembles messages split across reads and splits coalesced
+            # ones. An unterminated last message is still returned at EOF
             while self.running:
-                data = client_socket.recv(4096)
-                if not data:
+                line = await reader.readline()
+                if not line:
                     break
+                if not line.isspace():
+                    self.process_rssi_data(line)
 
-                self.process_rssi_data(data.decode('utf-8'))
-
+        except asyncio.CancelledError:
+            pass  # Server shutting down
         except Exception as e:
             print(f"Error with RSU {address}: {e}")
         finally:
-            client_socket.close()
+            self._rsu_writers.discard(writer)
+            writer.close()
             print(f"RSU {address} disconnected")
 
-    def process_rssi_data(self, data):
+    def _stop_serving(self):
+        """Close the RSU connections and the server (runs on the event loop thread)"""
+        for writer in list(self._rsu_writers):
+            writer.close()  # Ends the handler's readline with EOF
+        self._serve_task.cancel()
+
+    def process_rssi_data(self, data: bytes):
         """Process RSSI data from RSU"""
         try:
-            rsu_data = json.loads(data.strip())
+            # Both parsers take the raw line bytes and skip surrounding whitespace
+            if ORJSON_AVAILABLE:
+                rsu_data = orjson.loads(data)
+            else:
+                rsu_data = json.loads(data)
+
+            timestamp = rsu_data.get("timestamp")
+            if timestamp is None:
+                timestamp = _fast_now()
 
             # Create RSSI message
             rssi_msg = RSIMessage(
-                timestamp=rsu_data.get("timestamp", datetime.now(timezone.utc).isoformat()),
+                timestamp=timestamp,
                 rsu_id=rsu_data.get("rsu_id"),
                 obu_id=rsu_data.get("obu_id"),
                 rssi_value=float(rsu_data.get("rssi"))
@@ -166,30 +311,95 @@ class VictoriaGateway:
         except Exception as e:
             print(f"Failed to process RSU data: {e}")
 
+    async def _flush_periodically(self):
+        """Publish partially filled batches so samples never wait long"""
+        while True:
+            await asyncio.sleep(self._batch_interval)
+            self.flush_batch()
+
     def send_to_aws(self, message: RSIMessage):
         """Send message to AWS IoT"""
         if not self.connected:
             print("Cannot send - MQTT not connected")
             return
 
+        if self._batch_size > 1:
+            # Buffer the sample; publish once the batch is full
+            with self._pub_lock:
+                self._pub_buf.append(message)
+                if len(self._pub_buf) < self._batch_size:
+                    return
+                batch, self._pub_buf = self._pub_buf, []
+            self.publish_batch(batch)
+            return
+
         try:
-            topic = self.config["topic"]
-            payload = json.dumps(asdict(message))
-
-            self.mqtt_client.publish(
-                publish_packet=mqtt5.PublishPacket(
-                    topic=topic,
-                    payload=payload.encode('utf-8'),
-                    qos=mqtt5.QoS.AT_LEAST_ONCE
-                )
-            )
+            topic = self._topic
+            if self._binary_payload:
+                payload = message.pack()
+            elif ORJSON_AVAILABLE:
+                payload = orjson.dumps(message)  # Serializes dataclasses natively, returns bytes
+            else:
+                payload = json.dumps(message.as_dict()).encode('utf-8')
+
+            self.publish(topic, payload)
+            self._count_sent(1)
 
-            print(f"Sent RSSI data: RSU {message.rsu_id}, OBU {message.obu_id}, RSSI {message.rssi_value}")
-            print(f"Published to '{topic}': {payload}") #debugging
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Sent RSSI data: RSU {message.rsu_id}, OBU {message.obu_id}, RSSI {message.rssi_value}")
+                self.logger.debug(f"Published to '{topic}': {payload if self._binary_payload else payload.decode('utf-8')}")
 
         except Exception as e:
             print(f"Failed to send to AWS: {e}")
 
+    def flush_batch(self):
+        """Publish any buffered samples"""
+        with self._pub_lock:
+            if not self._pub_buf:
+                return
+            batch, self._pub_buf = self._pub_buf, []
+        self.publish_batch(batch)
+
+    def publish_batch(self, batch: List[RSIMessage]):
+        """Publish several samples as one JSON array payload (or concatenated binary records)"""
+        if not self.connected:
+            print(f"Cannot send batch of {len(batch)} - MQTT not connected")
+            return
+
+        try:
+            if self._binary_payload:
+                payload = b''.join([message.pack() for message in batch])
+            elif ORJSON_AVAILABLE:
+                payload = orjson.dumps(batch)
+            else:
+                payload = json.dumps([message.as_dict() for message in batch]).encode('utf-8')
+
+            self.publish(self._batch_topic, payload)
+            self._count_sent(len(batch))
+
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Sent RSSI batch of {len(batch)} samples to '{self._batch_topic}'")
+
+        except Exception as e:
+            print(f"Failed to send batch to AWS: {e}")
+
+    def _count_sent(self, count: int):
+        """Track published samples, logging progress every PROGRESS_EVERY samples"""
+        previous = self.sent_count
+        self.sent_count += count
+        if self.sent_count // PROGRESS_EVERY != previous // PROGRESS_EVERY:
+            self.logger.info(f"Published {self.sent_count} RSSI samples")
+
+    def publish(self, topic: str, payload: bytes):
+        """Publish a payload with at-least-once delivery"""
+        self.mqtt_client.publish(
+            publish_packet=mqtt5.PublishPacket(
+                topic=topic,
+                payload=payload,
+                qos=mqtt5.QoS.AT_LEAST_ONCE
+            )
+        )
+
     def start(self):
         """Start the gateway"""
         print("Starting Victoria Gateway...")
@@ -216,10 +426,27 @@ class VictoriaGateway:
 
     def stop(self):
         """Stop the gateway"""
+        if self.stopping:
+            return
+        self.stopping = True
         print("Stopping Victoria Gateway...")
 
         self.running = False
 
+        # Close socket; with the event loop running, close the RSU connections there too
+        if self._serve_loop is not None:
+            self._serve_loop.call_soon_threadsafe(self._stop_serving)
+            self._serve_loop = None
+            # Wait for the loop to stop so no sample arrives after the final flush
+            self._serve_thread.join(timeout=5)
+            print("Socket server closed")
+        elif self.socket_server:
+            self.socket_server.close()
+            print("Socket server closed")
+
+        # Publish samples still waiting for a full batch
+        self.flush_batch()
+
         # Stop MQTT
         if self.mqtt_client:
             try:
@@ -228,11 +455,6 @@ class VictoriaGateway:
             except Exception as e:
                 print(f"Error stopping MQTT: {e}")
 
-        # Close socket
-        if self.socket_server:
-            self.socket_server.close()
-            print("Socket server closed")
-
         print("Victoria Gateway stopped")
 
     def shutdown(self, signum, frame):